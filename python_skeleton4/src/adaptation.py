@@ -0,0 +1,96 @@
+from typing import List, Tuple
+
+import numpy as np
+
+
+class CovarianceAdaptation:
+    """
+    Self-adapting mutation distribution of Mutation.CMA and Mutation.CMA_DIAGONAL, shared by all members of an EA.
+    Children are drawn from N(parent, sigma^2 C). After every generation
+     - sigma follows the success rule of the (1 + 1)-CMA-ES: it grows if more than target_success of the mutants
+       are better than their parent and shrinks otherwise.
+     - the (sigma normalized) steps of the successful mutants are blended into C (rank-mu update), i.e. C learns the
+       directions that lead to improvements, e.g. the valley of an ill-conditioned objective. C is kept at trace dim,
+       its scale is left to sigma.
+    With diagonal=True only the variances are adapted, which costs O(dim) instead of O(dim^2) per child.
+    """
+
+    def __init__(self, dim: int, sigma: float, bounds: List[float], diagonal: bool = False,
+                 target_success: float = 2 / 11) -> None:
+        """
+        Init
+        :param dim: problem dimension
+        :param sigma: initial step size
+        :param bounds: children are clipped to bounds[0] <= x <= bounds[1]
+        :param diagonal: adapt only the diagonal of the covariance matrix
+        :param target_success: success rate at which sigma stays constant
+        """
+        assert 0 < sigma
+        assert 0 < target_success < 1
+        self.dim = dim
+        self.sigma = sigma
+        self.bounds = bounds
+        self.diagonal = diagonal
+        self.target_success = target_success
+        self.success_rate = target_success
+        self.damping = 1 + dim / 2
+        self.success_learning_rate = 1 / 12
+        self.covariance_learning_rate = 2 / (dim ** 2 + 6)
+        if diagonal:  # (dim + 2) / 3 times faster, like sep-CMA-ES
+            self.covariance_learning_rate = min(1., self.covariance_learning_rate * (dim + 2) / 3)
+        self.covariance = np.ones(dim) if diagonal else np.eye(dim)
+        self._cholesky = None if diagonal else np.eye(dim)
+
+    def sample(self, x: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Draws one child per parent
+        :param x: (n, dim) array of parent coordinates
+        :return: (n, dim) array of children (clipped to the bounds) and the (n, dim) array of their steps divided by
+                 sigma, which update expects
+        """
+        z = np.random.standard_normal(x.shape)
+        y = z * np.sqrt(self.covariance) if self.diagonal else z @ self._cholesky.T
+        children = np.clip(x + self.sigma * y, self.bounds[0], self.bounds[1])
+        return children, (children - x) / self.sigma
+
+    def update(self, steps: np.ndarray, success: np.ndarray) -> None:
+        """
+        Adapts sigma and the covariance after a generation
+        :param steps: (n, dim) array of the normalized steps of the mutants (see sample)
+        :param success: (n, ) boolean array, whether the mutant is better than its parent
+        """
+        success = np.asarray(success, dtype=bool)
+        if len(success) == 0:
+            return
+        self.success_rate += self.success_learning_rate * (np.mean(success) - self.success_rate)
+        successful = steps[success]
+        if len(successful):
+            # one rank-one update per successful step
+            learning_rate = 1 - (1 - self.covariance_learning_rate) ** len(successful)
+            if self.diagonal:
+                covariance = (1 - learning_rate) * self.covariance + learning_rate * np.mean(successful ** 2, axis=0)
+                self.covariance = np.maximum(covariance * self.dim / np.sum(covariance), 1e-12)
+            else:
+                covariance = (1 - learning_rate) * self.covariance + \
+                             learning_rate * successful.T @ successful / len(successful)
+                # the jitter bounds the condition number, steps along a single direction would make C singular
+                self.covariance = covariance * self.dim / np.trace(covariance) + 1e-10 * np.eye(self.dim)
+                try:
+                    self._cholesky = np.linalg.cholesky(self.covariance)
+                except np.linalg.LinAlgError:  # numerically degenerated, start over with an isotropic distribution
+                    self.covariance, self._cholesky = np.eye(self.dim), np.eye(self.dim)
+        self.sigma *= np.exp((self.success_rate - self.target_success) /
+                             (self.damping * (1 - self.target_success)))
+        self.sigma = min(self.sigma, self.bounds[1] - self.bounds[0])
+
+    def get_state(self) -> dict:
+        """The adapted parameters as arrays, e.g. for EA.save_checkpoint"""
+        return dict(sigma=self.sigma, success_rate=self.success_rate, covariance=self.covariance)
+
+    def set_state(self, state: dict) -> None:
+        """Inverse of get_state"""
+        self.sigma = float(state['sigma'])
+        self.success_rate = float(state['success_rate'])
+        self.covariance = np.array(state['covariance'])
+        if not self.diagonal:
+            self._cholesky = np.linalg.cholesky(self.covariance)
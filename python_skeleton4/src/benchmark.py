@@ -0,0 +1,200 @@
+import argparse
+import itertools
+import json
+import platform
+import time
+import timeit
+import tracemalloc
+from typing import List, Optional, Sequence
+
+import numpy as np
+import logging
+
+try:
+    from src.adaptation import CovarianceAdaptation
+    from src.evolution import EA, Member, Mutation, ParentSelection, Recombination, VectorizedEA
+    from src.target_function import ackley, rastrigin, rosenbrock, sphere
+except ModuleNotFoundError:  # executed as a script from within src
+    from adaptation import CovarianceAdaptation
+    from evolution import EA, Member, Mutation, ParentSelection, Recombination, VectorizedEA
+    from target_function import ackley, rastrigin, rosenbrock, sphere
+
+# name -> (target function, bounds)
+TARGETS = {
+    'ackley': (ackley, [-30, 30]),
+    'sphere': (sphere, [-30, 30]),
+    'rastrigin': (rastrigin, [-5.12, 5.12]),
+    'rosenbrock': (rosenbrock, [-5, 10]),
+}
+ENGINES = {'EA': EA, 'VectorizedEA': VectorizedEA}
+# the parameters identifying a benchmark record, see find_regressions
+EA_KEYS = ('engine', 'target', 'problem_dim', 'population_size', 'children_per_step', 'mutation', 'recombination',
+           'selection')
+OPERATOR_KEYS = ('problem_dim', 'population_size', 'children_per_step')
+
+
+def time_operators(problem_dim: int, population_size: int, children_per_step: int, number: int = 100) -> dict:
+    """
+    Seconds per call of the single operators: Member.mutate for every Mutation, Member.recombine for every
+    Recombination and EA.select_parents for every ParentSelection. Best of 3 repetitions of number calls each
+    :param problem_dim: dimension of the members
+    :param population_size: population size for the parent selection
+    :param children_per_step: number of parents to select
+    :param number: calls per repetition
+    :return: dict with the time per call for every operator, e.g. 'mutate_gaussian'
+    """
+    bounds = [-30, 30]
+    timings = {}
+    for mutation in Mutation:
+        adaptation = None
+        if mutation in (Mutation.CMA, Mutation.CMA_DIAGONAL):
+            adaptation = CovarianceAdaptation(problem_dim, 1., bounds, diagonal=mutation == Mutation.CMA_DIAGONAL)
+        member = Member(np.random.uniform(*bounds, problem_dim), ackley, bounds, mutation, Recombination.NONE,
+                        sigma=1., recom_prob=.5, fitness=0., adaptation=adaptation)
+        timings['mutate_' + mutation.name.lower()] = min(timeit.repeat(member.mutate, number=number,
+                                                                       repeat=3)) / number
+    for recombination in Recombination:
+        member, partner = [Member(np.random.uniform(*bounds, problem_dim), ackley, bounds, Mutation.NONE,
+                                  recombination, sigma=1., recom_prob=.5, fitness=0.) for _ in range(2)]
+        timings['recombine_' + recombination.name.lower()] = min(timeit.repeat(
+            lambda: member.recombine(partner), number=number, repeat=3)) / number
+    for selection in ParentSelection:
+        ea = EA(ackley, population_size, problem_dim, selection_type=selection, children_per_step=children_per_step)
+        timings['select_parents_' + selection.name.lower()] = min(timeit.repeat(ea.select_parents, number=number,
+                                                                                repeat=3)) / number
+    return timings
+
+
+def benchmark_ea(engine: str, target: str, problem_dim: int, population_size: int, children_per_step: int,
+                 mutation: Mutation, recombination: Recombination, selection: ParentSelection,
+                 num_generations: int = 20, seed: int = 0) -> dict:
+    """
+    Times the initialization and num_generations calls of step of one EA configuration. The peak memory is measured
+    in a second, identical run since tracemalloc slows down the interpreter considerably
+    :param engine: key of ENGINES
+    :param target: key of TARGETS
+    :param problem_dim: int
+    :param population_size: int
+    :param children_per_step: int
+    :param mutation: mutation type
+    :param recombination: recombination type
+    :param selection: selection type
+    :param num_generations: number of timed steps
+    :param seed: numpy seed of both runs
+    :return: record with the configuration, evaluations per second (of the steps), median time per generation,
+             initialization time, peak memory (bytes allocated by python and numpy) and the final best fitness
+    """
+    func, bounds = TARGETS[target]
+    settings = dict(population_size=population_size, problem_dim=problem_dim, problem_bounds=bounds,
+                    mutation_type=mutation, recombination_type=recombination, selection_type=selection,
+                    children_per_step=children_per_step,
+                    total_number_of_function_evaluations=population_size + num_generations * children_per_step)
+    np.random.seed(seed)
+    start = time.perf_counter()
+    ea = ENGINES[engine](func, **settings)
+    init_time = time.perf_counter() - start
+    step_times = []
+    for _ in range(num_generations):
+        start = time.perf_counter()
+        ea.step()
+        step_times.append(time.perf_counter() - start)
+
+    np.random.seed(seed)
+    tracemalloc.start()
+    try:
+        ea = ENGINES[engine](func, **settings)
+        for _ in range(num_generations):
+            ea.step()
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return dict(engine=engine, target=target, problem_dim=problem_dim, population_size=population_size,
+                children_per_step=children_per_step, mutation=mutation.name, recombination=recombination.name,
+                selection=selection.name, num_generations=num_generations,
+                evals_per_second=num_generations * children_per_step / sum(step_times),
+                time_per_generation=float(np.median(step_times)), init_time=init_time, peak_memory=peak_memory,
+                best_fitness=float(ea.get_best_fitness()))
+
+
+def run_benchmarks(problem_dims: Sequence[int] = (2, 10, 100), population_sizes: Sequence[int] = (10, 100),
+                   children_per_step: Sequence[int] = (5, 50), targets: Sequence[str] = tuple(TARGETS),
+                   engines: Sequence[str] = tuple(ENGINES), num_generations: int = 20, seed: int = 0,
+                   output: Optional[str] = None) -> dict:
+    """
+    Benchmarks every combination of the given problem dimensions, population sizes and children per step with every
+    Mutation/Recombination/ParentSelection combination on every target and engine
+    :param problem_dims: problem dimensions to sweep
+    :param population_sizes: population sizes to sweep
+    :param children_per_step: children per step to sweep
+    :param targets: keys of TARGETS
+    :param engines: keys of ENGINES
+    :param num_generations: number of timed steps per configuration
+    :param seed: numpy seed of every run
+    :param output: Optional file name, the results are written there as json
+    :return: dict with information about the machine, the operator timings (see time_operators) and one record per
+             EA configuration (see benchmark_ea)
+    """
+    results = dict(python=platform.python_version(), numpy=np.__version__, machine=platform.machine(),
+                   processor=platform.processor(), date=time.strftime('%Y-%m-%d %H:%M:%S'), operators=[], ea=[])
+    for dim, pop_size, num_children in itertools.product(problem_dims, population_sizes, children_per_step):
+        results['operators'].append(dict(problem_dim=dim, population_size=pop_size, children_per_step=num_children,
+                                         **time_operators(dim, pop_size, num_children)))
+        for engine, target, mutation, recombination, selection in itertools.product(
+                engines, targets, Mutation, Recombination, ParentSelection):
+            results['ea'].append(benchmark_ea(engine, target, dim, pop_size, num_children, mutation, recombination,
+                                              selection, num_generations, seed))
+    if output is not None:
+        with open(output, 'w') as file:
+            json.dump(results, file, indent=1)
+    return results
+
+
+def find_regressions(baseline: dict, results: dict, tolerance: float = 1.2) -> List[dict]:
+    """
+    Compares two outputs of run_benchmarks. Only configurations present in both are compared
+    :param baseline: earlier results
+    :param results: new results
+    :param tolerance: allowed slow down factor
+    :return: one entry per EA configuration whose time per generation and per operator whose time per call grew
+             by more than tolerance, with the old and new time
+    """
+    regressions = []
+    for records, keys, metrics in [('ea', EA_KEYS, ['time_per_generation']), ('operators', OPERATOR_KEYS, None)]:
+        old = {tuple(record[key] for key in keys): record for record in baseline[records]}
+        for record in results[records]:
+            config = tuple(record[key] for key in keys)
+            if config not in old:
+                continue
+            for metric in metrics or [m for m in record if m not in keys]:
+                if record[metric] > tolerance * old[config][metric]:
+                    regressions.append(dict(zip(keys, config), metric=metric, baseline=old[config][metric],
+                                            new=record[metric]))
+    return regressions
+
+
+if __name__ == '__main__':
+    """
+    e.g. python -m src.benchmark --problem_dims 2 100 1000 --engines VectorizedEA --output benchmark.json
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--problem_dims', default=[2, 10, 100], type=int, nargs='+', help='problem dimensions')
+    parser.add_argument('--population_sizes', default=[10, 100], type=int, nargs='+', help='population sizes')
+    parser.add_argument('--children_per_step', default=[5, 50], type=int, nargs='+', help='children per step')
+    parser.add_argument('--targets', default=list(TARGETS), choices=list(TARGETS), nargs='+',
+                        help='target functions')
+    parser.add_argument('--engines', default=list(ENGINES), choices=list(ENGINES), nargs='+', help='EA classes')
+    parser.add_argument('--num_generations', default=20, type=int, help='timed steps per configuration')
+    parser.add_argument('--seed', default=0, type=int, help='random seed')
+    parser.add_argument('--output', default='benchmark.json', type=str, help='json file for the results')
+    parser.add_argument('--baseline', default=None, type=str,
+                        help='json file of an earlier run, slow downs of more than 20%% are printed')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    results = run_benchmarks(args.problem_dims, args.population_sizes, args.children_per_step, args.targets,
+                             args.engines, args.num_generations, args.seed, args.output)
+    print('{} EA configurations written to {}'.format(len(results['ea']), args.output))
+    if args.baseline is not None:
+        with open(args.baseline) as file:
+            for regression in find_regressions(json.load(file), results):
+                print(regression)
@@ -1,20 +1,43 @@
-from typing import List, Optional
+from typing import List, Optional, Tuple, Union
+from concurrent.futures import Executor, Future, FIRST_COMPLETED, wait
 from enum import IntEnum
+import bisect
+import json
+import math
+import os
+import pickle
+import time
 import numpy as np
 import logging
 
+try:
+    from src.adaptation import CovarianceAdaptation
+    from src.fitness_cache import FitnessCache
+    from src.parallel import make_executor, num_workers
+    from src.target_function import evaluate_batch
+except ModuleNotFoundError:  # executed as a script from within src, e.g. python src/evolution.py
+    from adaptation import CovarianceAdaptation
+    from fitness_cache import FitnessCache
+    from parallel import make_executor, num_workers
+    from target_function import evaluate_batch
+
 
 # The two following classes just make it convenient to select which mutation/recombination/selectoin to use with EA
 class Recombination(IntEnum):
     NONE = -1  # can be used when only mutation is required
     UNIFORM = 0  # uniform crossover (only really makes sense for function dimension > 1)
     INTERMEDIATE = 1  # intermediate recombination
+    N_POINT = 2  # n-point crossover, the parents' genes alternate between randomly chosen cut points
+    BLEND = 3  # blend crossover (BLX-alpha), genes are drawn from the parents' range extended by alpha on both sides
+    SBX = 4  # simulated binary crossover, spread of the child around the parents is controlled by eta
 
 
 class Mutation(IntEnum):
     NONE = -1  # Can be used when only recombination is required
     UNIFORM = 0  # Uniform mutation
     GAUSSIAN = 1  # Gaussian mutation
+    CMA = 2  # Gaussian mutation with adapted step size and covariance matrix (see adaptation.CovarianceAdaptation)
+    CMA_DIAGONAL = 3  # like CMA but only the variances are adapted
 
 
 class ParentSelection(IntEnum):
@@ -27,10 +50,14 @@ class Member:
     """
     Class to simplify member handling.
     """
+    # one logger shared by all members, debug output is only formatted if it is enabled
+    logger = logging.getLogger('Member')
 
     def __init__(self, initial_x: np.ndarray, target_function: callable, bounds: List[float],
                  mutation: Mutation, recombination: Recombination,
-                 sigma: Optional[float] = None, recom_prob: Optional[float] = None) -> None:
+                 sigma: Optional[float] = None, recom_prob: Optional[float] = None,
+                 fitness: Optional[float] = None, fitness_cache: Optional[FitnessCache] = None,
+                 adaptation: Optional[CovarianceAdaptation] = None) -> None:
         """
         Init
         :param initial_x: Initial coordinate of the member
@@ -41,6 +68,11 @@ class Member:
         :param recombination: hyperparameter that determines which recombination type to use
         :param sigma: Optional hyperparameter that is only active if mutation is gaussian
         :param recom_prob: Optional hyperparameter that is only active if recombination is uniform
+        :param fitness: Optional already known fitness of initial_x. Avoids re-evaluating the target function
+        :param fitness_cache: Optional cache shared by all members (and EAs) using it. Identical coordinates are
+                              then only evaluated once. Offspring inherit the cache
+        :param adaptation: mutation distribution of the CMA mutation types, shared by all members of an EA.
+                           Offspring inherit it
         """
         self._x = initial_x.astype(float)  # astype is crucial here. Otherwise numpy might cast everything to int
         self._f = target_function
@@ -48,17 +80,22 @@ class Member:
         self._age = 0  # basically indicates how many offspring were generated from this member
         self._mutation = mutation
         self._recombination = recombination
-        self._x_changed = True
-        self._fit = None
+        self._x_changed = fitness is None
+        self._fit = fitness
         self._sigma = sigma
         self._recom_prob = recom_prob
-        self.logger = logging.getLogger(self.__class__.__name__)
+        self._cache = fitness_cache
+        self._adaptation = adaptation
+        self._origin = None  # (normalized step, parent fitness) of CMA mutants, until the EA adapted to them
 
     @property  # fitness can only be queried never set
     def fitness(self):
         if self._x_changed:  # Only if the x_coordinate has changed we need to evaluate the fitness.
             self._x_changed = False
-            self._fit = self._f(self._x)
+            if self._cache is not None:
+                self._fit = self._cache.evaluate(self._f, self._x)[0]
+            else:
+                self._fit = self._f(self._x)
         return self._fit  # otherwise we can return the cached value
 
     @property  # properties let us easily handle getting and setting without exposing our private variables
@@ -77,8 +114,10 @@ class Member:
         :return: new member who is based on this member
         """
         new_x = self.x_coordinate.copy()
-        self.logger.debug('new point before mutation:')
-        self.logger.debug(new_x)
+        debug = self.logger.isEnabledFor(logging.DEBUG)
+        if debug:
+            self.logger.debug('new point before mutation:')
+            self.logger.debug(new_x)
         # TODO modify new_x either through uniform or gaussian mutation
         if self._mutation == Mutation.UNIFORM:
             # TODO
@@ -90,13 +129,20 @@ class Member:
                                      size=self.x_coordinate.shape)
             new_x[new_x > self.__bounds[1]] = self.__bounds[1]
             new_x[new_x < self.__bounds[0]] = self.__bounds[0]
+        elif self._mutation in (Mutation.CMA, Mutation.CMA_DIAGONAL):
+            assert self._adaptation is not None, 'CMA mutation requires the covariance adaptation of the EA'
+            new_x, step = self._adaptation.sample(self.x_coordinate[None])
+            new_x, origin = new_x[0], (step[0], self.fitness)
         elif self._mutation != Mutation.NONE:
             # We won't consider any other mutation types
             raise NotImplementedError
-        self.logger.debug('new point after mutation:')
-        self.logger.debug(new_x)
+        if debug:
+            self.logger.debug('new point after mutation:')
+            self.logger.debug(new_x)
         child = Member(new_x, self._f, self.__bounds, self._mutation, self._recombination,
-                       self._sigma, self._recom_prob)
+                       self._sigma, self._recom_prob, fitness_cache=self._cache, adaptation=self._adaptation)
+        if self._mutation in (Mutation.CMA, Mutation.CMA_DIAGONAL):
+            child._origin = origin
         self._age += 1
         return child
 
@@ -106,24 +152,13 @@ class Member:
         :param partner: Member
         :return: new offspring based on this member and partner
         """
-        if self._recombination == Recombination.INTERMEDIATE:
-            new_x = (self.x_coordinate + partner.x_coordinate) / 2
-        elif self._recombination == Recombination.UNIFORM:
-            assert self._recom_prob is not None, \
-                'for this recombination type you have to specify the recombination probability'
-            dominant_gene = np.random.choice([0,1], size=self.x_coordinate.shape,
-                                             p=[self._recom_prob, 1-self._recom_prob])
-            stacked_genes = np.array(np.vstack((self.x_coordinate, partner.x_coordinate))).transpose()
-            new_x = np.array([stacked_genes[j, i] for i, j in 
-                              zip(dominant_gene, range(len(dominant_gene)))])
-        elif self._recombination == Recombination.NONE:
-            new_x = self.x_coordinate.copy()  # copy is important here to not only get a reference
-        else:
-            raise NotImplementedError
-        self.logger.debug('new point after recombination:')
-        self.logger.debug(new_x)
+        new_x = recombine_batch(self.x_coordinate[None], partner.x_coordinate[None], self._recombination,
+                                self._recom_prob, self.__bounds)[0]
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug('new point after recombination:')
+            self.logger.debug(new_x)
         child = Member(new_x, self._f, self.__bounds, self._mutation, self._recombination,
-                       self._sigma, self._recom_prob)
+                       self._sigma, self._recom_prob, fitness_cache=self._cache, adaptation=self._adaptation)
         self._age += 1
         return child
 
@@ -137,56 +172,448 @@ class Member:
         return self.__str__() + '\n'
 
 
+def evaluate_members(members: List[Member], executor: Optional[Executor] = None, num_chunks: int = 1) -> None:
+    """
+    Evaluates the fitness of all members whose coordinate changed with a single (batched) call of the target function.
+    All members are assumed to share the same target function.
+    :param members: list of members
+    :param executor: Optional executor to evaluate the members concurrently
+    :param num_chunks: number of chunks for batch capable target functions (see target_function.evaluate_batch)
+    """
+    pending = [m for m in members if m._x_changed]
+    if not pending:
+        return
+    coordinates = np.vstack([m.x_coordinate for m in pending])
+    if pending[0]._cache is not None:
+        fitness = pending[0]._cache.evaluate(pending[0]._f, coordinates, executor, num_chunks)
+    else:
+        fitness = evaluate_batch(pending[0]._f, coordinates, executor, num_chunks)
+    for member, fit in zip(pending, fitness):
+        member._fit = fit
+        member._x_changed = False
+
+
+def sample_without_replacement(num_rows: int, n: int, k: int) -> np.ndarray:
+    """
+    Draws num_rows independent, uniformly random k-subsets of range(n) at once.
+    Robert Floyd's algorithm vectorized over the rows, i.e. it only loops k times independent of num_rows and n.
+    :param num_rows: number of subsets
+    :param n: size of the set to sample from
+    :param k: size of the subsets (k <= n)
+    :return: (num_rows, k) index matrix, the entries of each row are distinct
+    """
+    assert 0 < k <= n
+    samples = np.empty((num_rows, k), dtype=int)
+    for j, upper in enumerate(range(n - k, n)):
+        candidates = np.random.randint(upper + 1, size=num_rows)
+        taken = np.any(samples[:, :j] == candidates[:, None], axis=1)
+        samples[:, j] = np.where(taken, upper, candidates)
+    return samples
+
+
+def select_parent_ids(fitness: np.ndarray, selection: ParentSelection, num_children: int,
+                      tournament_size: int = 2) -> np.ndarray:
+    """
+    Implements all selection mechanism on an array of fitness values without looping over the children.
+    :param fitness: (pop_size, ) array with the fitness of the population members
+    :param selection: which selection mechanism to use
+    :param num_children: number of parents to select
+    :param tournament_size: number of contestants per tournament (capped by the population size)
+    :return: array of ids of selected parents.
+    """
+    pop_size = len(fitness)
+    if selection == ParentSelection.NEUTRAL:
+        return np.random.randint(pop_size, size=num_children)
+    elif selection == ParentSelection.FITNESS:
+        y = fitness - np.max(fitness)
+        # if all members are equally fit we fall back to neutral selection
+        p = y / np.sum(y) if np.any(y) else None
+        return np.random.choice(pop_size, size=num_children, p=p)
+    elif selection == ParentSelection.TOURNAMENT:
+        # one row of contestants per tournament, the fittest contestant of every row wins
+        contestants = sample_without_replacement(num_children, pop_size, min(tournament_size, pop_size))
+        winners = np.argmin(fitness[contestants], axis=1)
+        return contestants[np.arange(num_children), winners]
+    raise NotImplementedError
+
+
+def mutate_batch(x: np.ndarray, mutation: Mutation, bounds: List[float], sigma: Optional[float] = None,
+                 adaptation: Optional[CovarianceAdaptation] = None) -> np.ndarray:
+    """
+    Array version of Member.mutate. Creates one mutated offspring for every row of x
+    :param x: (n, dim) array of parent coordinates
+    :param mutation: which mutation type to use
+    :param bounds: Allowed bounds -> bounds[0] lower bound && bounds[1] upper bounds
+    :param sigma: Optional hyperparameter that is only active if mutation is gaussian
+    :param adaptation: Optional mutation distribution, only active if mutation is CMA or CMA_DIAGONAL
+    :return: (n, dim) array of offspring coordinates
+    """
+    if mutation == Mutation.UNIFORM:
+        return np.random.uniform(low=bounds[0], high=bounds[1], size=x.shape)
+    elif mutation == Mutation.GAUSSIAN:
+        assert sigma, 'Sigma has to be set when gaussian mutation is used'
+        return np.clip(np.random.normal(loc=x, scale=sigma), bounds[0], bounds[1])
+    elif mutation in (Mutation.CMA, Mutation.CMA_DIAGONAL):
+        assert adaptation is not None, 'CMA mutation requires the covariance adaptation of the EA'
+        return adaptation.sample(x)[0]
+    elif mutation == Mutation.NONE:
+        return x.copy()
+    raise NotImplementedError
+
+
+def recombine_batch(x_a: np.ndarray, x_b: np.ndarray, recombination: Recombination,
+                    recom_prob: Optional[float] = None, bounds: Optional[List[float]] = None, num_points: int = 2,
+                    alpha: float = .5, eta: float = 2.) -> np.ndarray:
+    """
+    Array version of Member.recombine. Row i of x_a is recombined with row i of x_b
+    :param x_a: (n, dim) array of coordinates of the first parents
+    :param x_b: (n, dim) array of coordinates of the partners
+    :param recombination: which recombination type to use
+    :param recom_prob: Optional hyperparameter that is only active if recombination is uniform
+    :param bounds: Optional bounds -> bounds[0] lower bound && bounds[1] upper bounds. Blend and simulated binary
+                   crossover can create children outside of the parents' box, they are clipped to the bounds
+    :param num_points: number of cut points of n-point crossover (at most dim - 1 are used)
+    :param alpha: extension of the parents' range for blend crossover
+    :param eta: distribution index of simulated binary crossover, larger values keep children closer to the parents
+    :return: (n, dim) array of offspring coordinates
+    """
+    if recombination == Recombination.INTERMEDIATE:
+        return (x_a + x_b) / 2
+    elif recombination == Recombination.UNIFORM:
+        assert recom_prob is not None, \
+            'for this recombination type you have to specify the recombination probability'
+        # a gene is inherited from x_a with probability recom_prob
+        return np.where(np.random.random(x_a.shape) < recom_prob, x_a, x_b)
+    elif recombination == Recombination.N_POINT:
+        n, dim = x_a.shape
+        if dim < 2 or num_points < 1:
+            return x_a.copy()
+        # mark the cut points (genes 1..dim-1 can start a new segment), every cut switches to the other parent
+        cuts = np.zeros((n, dim), dtype=int)
+        np.put_along_axis(cuts, sample_without_replacement(n, dim - 1, min(num_points, dim - 1)) + 1, 1, axis=1)
+        return np.where(np.cumsum(cuts, axis=1) % 2 == 0, x_a, x_b)
+    elif recombination == Recombination.BLEND:
+        low, high = np.minimum(x_a, x_b), np.maximum(x_a, x_b)
+        spread = alpha * (high - low)
+        new_x = np.random.uniform(low - spread, high + spread)
+    elif recombination == Recombination.SBX:
+        u = np.random.random(x_a.shape)
+        beta = np.where(u <= .5, (2 * u) ** (1 / (eta + 1)), (1 / (2 * (1 - u))) ** (1 / (eta + 1)))
+        # each gene is taken from either of the two SBX children, i.e. is spread to either side of the parents' mean
+        beta *= np.random.choice([-1, 1], size=x_a.shape)
+        new_x = .5 * ((1 + beta) * x_a + (1 - beta) * x_b)
+    elif recombination == Recombination.NONE:
+        return x_a.copy()
+    else:
+        raise NotImplementedError
+    return new_x if bounds is None else np.clip(new_x, bounds[0], bounds[1])
+
+
 class EA:
     def __init__(self, target_func: callable, population_size: int = 10, problem_dim: int = 2,
                  problem_bounds: List = [-30, 30], mutation_type: Mutation = Mutation.UNIFORM,
                  recombination_type: Recombination = Recombination.INTERMEDIATE,
                  sigma: float = 1., recom_proba: float = 0.5, selection_type: ParentSelection = ParentSelection.NEUTRAL,
                  total_number_of_function_evaluations: int = 200, children_per_step: int = 5,
-                 fraction_mutation: float = .5
+                 fraction_mutation: float = .5, executor: Union[None, str, Executor] = None,
+                 max_workers: Optional[int] = None, tournament_size: Optional[int] = None,
+                 fitness_cache: Optional[FitnessCache] = None
                  ):
         """
         Simple evolutionary algorithm
-        :param target_func: callable target function we optimize
+        :param target_func: callable target function we optimize. Batch capable target functions
+                            (see target_function.batch_target) are called once per generation
         :param population_size: int
         :param problem_dim: int
         :param problem_bounds: list[int] used to make sure population members are valid
         :param mutation_type: hyperparameter to set mutation strategy
         :param recombination_type: hyperparameter to set recombination strategy
-        :param sigma: conditional hyperparameter dependent on mutation_type GAUSSIAN
+        :param sigma: conditional hyperparameter dependent on mutation_type GAUSSIAN. For CMA and CMA_DIAGONAL the
+                      initial step size, which is adapted during the run
         :param recom_proba: conditional hyperparameter dependent on recombination_type UNIFORM
         :param selection_type: hyperparameter to set selection strategy
         :param total_number_of_function_evaluations: maximum allowed function evaluations
         :param children_per_step: how many children to produce per step
         :param fraction_mutation: balance between sexual and asexual reproduction
+        :param executor: how to evaluate the offspring of a generation. None evaluates serially, 'thread' or
+                         'process' creates a pool with max_workers workers which is shut down by close() (optimize
+                         does so when it finishes) and a user provided concurrent.futures.Executor is used as is
+                         (and never shut down by the EA). A process pool requires a picklable target function
+        :param max_workers: number of workers of the thread or process pool
+        :param tournament_size: conditional hyperparameter dependent on selection_type TOURNAMENT. Number of
+                                contestants per tournament, defaults to children_per_step (but at least 2, a
+                                single contestant would not be a tournament)
+        :param fitness_cache: Optional FitnessCache. Share one instance between EA runs on the same target to also
+                              reuse function values across runs. Does not change the _func_evals accounting
         """
+        self._configure(target_func, population_size, problem_dim, problem_bounds, mutation_type, recombination_type,
+                        sigma, recom_proba, selection_type, total_number_of_function_evaluations, children_per_step,
+                        fraction_mutation, executor, max_workers, tournament_size, fitness_cache)
+        # Step 1: initialize Population
+        self._init_population(np.random.uniform(*problem_bounds, (population_size, problem_dim)))
+        self.logger.info('Initial average fitness of population: %f', self.get_average_fitness())
+        # will store the optimization trajectory and lets you easily observe how often
+        # a new best member was generated
+        self._init_trajectory()
+
+    def _configure(self, target_func, population_size, problem_dim, problem_bounds, mutation_type, recombination_type,
+                   sigma, recom_proba, selection_type, total_number_of_function_evaluations, children_per_step,
+                   fraction_mutation, executor, max_workers, tournament_size, fitness_cache) -> None:
+        """Checks and stores the arguments of __init__ (see there), shared with resume"""
         assert 0 <= fraction_mutation <= 1
         assert 0 < children_per_step
         assert 0 < total_number_of_function_evaluations
         assert 0 < sigma
         assert 0 < problem_dim
         assert 0 < population_size
-        # Step 1: initialize Population
-        self.population = [
-            Member(np.random.uniform(*problem_bounds, problem_dim),
-                   target_func, problem_bounds, mutation_type, recombination_type, sigma, recom_proba
-                   ) for _ in range(population_size)]
-        self.population.sort(key=lambda x: x.fitness)  # sort population by fitness for easier handling downstream
+        assert tournament_size is None or 0 < tournament_size
+        self._f = target_func
+        self._bounds = problem_bounds
+        self._mutation = mutation_type
+        self._recombination = recombination_type
+        self._sigma = sigma
+        self._recom_prob = recom_proba
+        self._cache = fitness_cache
         self.pop_size = population_size
+        self.dim = problem_dim
         self.selection = selection_type
+        self.tournament_size = tournament_size or max(2, children_per_step)
         self.logger = logging.getLogger(self.__class__.__name__)
-        self.logger.info('Initial average fitness of population: %f', self.get_average_fitness())
         self.max_func_evals = total_number_of_function_evaluations
         self._func_evals = population_size
         self.num_children = children_per_step
         self.frac_mutants = fraction_mutation
-        # will store the optimization trajectory and lets you easily observe how often
-        self.trajectory = [self.population[0]]
-        # a new best member was generated
+        self._executor_type = executor
+        self._max_workers = max_workers
+        self._executor, self._owns_executor = None, False
+        self._phase_times = {}  # wall time of the phases of the last step
+        self._adaptation = None
+        if mutation_type in (Mutation.CMA, Mutation.CMA_DIAGONAL):
+            self._adaptation = CovarianceAdaptation(problem_dim, sigma, problem_bounds,
+                                                    diagonal=mutation_type == Mutation.CMA_DIAGONAL)
+
+    def _init_population(self, initial_x: np.ndarray) -> None:
+        """
+        Creates the initial population
+        :param initial_x: (pop_size, dim) array of initial coordinates
+        """
+        population = [
+            Member(x, self._f, self._bounds, self._mutation, self._recombination, self._sigma, self._recom_prob,
+                   fitness_cache=self._cache, adaptation=self._adaptation) for x in initial_x]
+        evaluate_members(population, self._get_executor(), self._num_workers())
+        self.population = population
+
+    @property
+    def population(self) -> Tuple[Member, ...]:
+        """
+        The population, always sorted by fitness for easier handling downstream. Read-only (tuple), to change it
+        assign a new list of members, which is sorted once. Afterwards new members are only inserted through _insert
+        """
+        return tuple(self._population)
+
+    @population.setter
+    def population(self, members: List[Member]) -> None:
+        self._population = sorted(members, key=lambda x: x.fitness)
+        self._fitness_keys = [m.fitness for m in self._population]  # sorted fitness values to bisect on
+        self._resync_fitness_sum()
+        self._fitness_array = None
+
+    def _resync_fitness_sum(self) -> None:
+        """
+        Recomputes the running sum used by get_average_fitness exactly. Called every pop_size inserts so rounding
+        errors of the incremental updates can't accumulate over long runs
+        """
+        self._fitness_sum = math.fsum(self._fitness_keys)
+        self._inserts_since_resync = 0
+
+    def _insert(self, member: Member) -> None:
+        """
+        Survival selection for a single new member: binary insert into the sorted population, if the population
+        is full afterwards the worst member dies. Members with equal fitness keep their insertion order.
+        :param member: evaluated new member
+        """
+        fitness = member.fitness
+        position = bisect.bisect_right(self._fitness_keys, fitness)
+        if position >= self.pop_size:  # worse than the whole (full) population
+            return
+        self._fitness_keys.insert(position, fitness)
+        self._population.insert(position, member)
+        self._fitness_sum += fitness
+        self._fitness_array = None
+        if len(self._population) > self.pop_size:
+            self._fitness_sum -= self._fitness_keys.pop()
+            self._population.pop()
+        self._inserts_since_resync += 1
+        if self._inserts_since_resync >= self.pop_size:
+            self._resync_fitness_sum()
+
+    def get_best_member(self) -> Member:
+        """Helper to quickly access the currently best member"""
+        return self._population[0]
+
+    def get_best_fitness(self) -> float:
+        """Helper to quickly access the fitness of the currently best member"""
+        return self._fitness_keys[0]
+
+    def emigrants(self, num_migrants: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Copies of the best members as plain arrays, e.g. to send them to another process (see island.IslandModel)
+        :param num_migrants: number of members
+        :return: (num_migrants, dim) array of coordinates and (num_migrants, ) array of their fitness values
+        """
+        best = self._population[:num_migrants]
+        return np.vstack([m.x_coordinate for m in best]), np.array(self._fitness_keys[:num_migrants])
+
+    def immigrate(self, x: np.ndarray, fitness: np.ndarray) -> None:
+        """
+        Survival selection for already evaluated members from elsewhere. Does not count as function evaluations
+        :param x: (n, dim) array of coordinates
+        :param fitness: (n, ) array of their fitness values
+        """
+        for coordinate, fit in zip(x, fitness):
+            self._insert(Member(coordinate, self._f, self._bounds, self._mutation, self._recombination, self._sigma,
+                                self._recom_prob, fitness=fit, fitness_cache=self._cache,
+                                adaptation=self._adaptation))
+
+    def _init_trajectory(self) -> None:
+        self._trajectory_x = [self._population[0].x_coordinate.copy()]
+        self._trajectory_fitness = [self._fitness_keys[0]]
+
+    def _record_trajectory(self) -> None:
+        """Appends the coordinate and fitness of the currently best member to the trajectory"""
+        self._trajectory_x.append(self._population[0].x_coordinate.copy())
+        self._trajectory_fitness.append(self._fitness_keys[0])
+
+    @property
+    def trajectory(self) -> List[Member]:
+        """Member view of the trajectory, created on access. See trajectory_x and trajectory_fitness"""
+        return [Member(x, self._f, self._bounds, self._mutation, self._recombination, self._sigma, self._recom_prob,
+                       fitness=fit) for x, fit in zip(self._trajectory_x, self._trajectory_fitness)]
+
+    @property
+    def trajectory_x(self) -> np.ndarray:
+        """(num_steps + 1, dim) array of the best coordinate after initialization and after every step"""
+        return np.array(self._trajectory_x)
+
+    @property
+    def trajectory_fitness(self) -> np.ndarray:
+        """(num_steps + 1, ) array of the best fitness after initialization and after every step"""
+        return np.array(self._trajectory_fitness)
+
+    def _checkpoint_state(self) -> dict:
+        """Arrays describing the population, see save_checkpoint"""
+        x, fitness = self.emigrants(self.pop_size)
+        return dict(x=x, fitness=fitness, fitness_sum=self._fitness_sum,
+                    inserts_since_resync=self._inserts_since_resync)
+
+    def _restore_state(self, state: dict) -> None:
+        """Inverse of _checkpoint_state"""
+        self.population = [Member(x, self._f, self._bounds, self._mutation, self._recombination, self._sigma,
+                                  self._recom_prob, fitness=fit, fitness_cache=self._cache,
+                                  adaptation=self._adaptation) for x, fit in zip(state['x'], state['fitness'])]
+        self._fitness_sum = float(state['fitness_sum'])
+        self._inserts_since_resync = int(state['inserts_since_resync'])
+
+    def save_checkpoint(self, path: str) -> None:
+        """
+        Writes everything needed to continue the optimization to path (a .npz file): the population as arrays, the
+        evaluation counter, the trajectory, the hyperparameters, the target function (if it can be pickled) and the
+        state of numpy's global random number generator. The file is first written next to path and then moved
+        there, i.e. path always holds a complete checkpoint. Executor and fitness cache are not stored.
+        :param path: file name of the checkpoint
+        """
+        config = dict(population_size=self.pop_size, problem_dim=self.dim,
+                      problem_bounds=np.asarray(self._bounds).tolist(), mutation_type=int(self._mutation),
+                      recombination_type=int(self._recombination), sigma=self._sigma, recom_proba=self._recom_prob,
+                      selection_type=int(self.selection),
+                      total_number_of_function_evaluations=self.max_func_evals, children_per_step=self.num_children,
+                      fraction_mutation=self.frac_mutants, tournament_size=self.tournament_size)
+        try:
+            target = pickle.dumps(self._f)
+        except (pickle.PicklingError, AttributeError, TypeError):  # e.g. lambdas, have to be passed to resume
+            target = b''
+        _, rng_keys, rng_pos, rng_has_gauss, rng_cached_gaussian = np.random.get_state()
+        if self._adaptation is not None:
+            state = {'adaptation_' + key: value for key, value in self._adaptation.get_state().items()}
+        else:
+            state = {}
+        state.update(self._checkpoint_state(), config=json.dumps(config), func_evals=self._func_evals,
+                     trajectory_x=self.trajectory_x, trajectory_fitness=self.trajectory_fitness,
+                     target=np.frombuffer(target, dtype=np.uint8), rng_keys=rng_keys, rng_pos=rng_pos,
+                     rng_has_gauss=rng_has_gauss, rng_cached_gaussian=rng_cached_gaussian)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as file:
+            np.savez(file, **state)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def resume(cls, path: str, target_func: Optional[callable] = None, executor: Union[None, str, Executor] = None,
+               max_workers: Optional[int] = None, fitness_cache: Optional[FitnessCache] = None) -> 'EA':
+        """
+        Restores an EA from a checkpoint written by save_checkpoint (e.g. by optimize) and numpy's global random
+        state with it, so optimize continues exactly as the interrupted run would have
+        :param path: file name of the checkpoint
+        :param target_func: the target function. Only required if it could not be stored in the checkpoint
+        :param executor: see __init__
+        :param max_workers: see __init__
+        :param fitness_cache: see __init__
+        :return: the restored EA
+        """
+        with np.load(path) as checkpoint:
+            state = dict(checkpoint)
+        if target_func is None:
+            assert state['target'].size, 'the target function is not part of the checkpoint, please pass it'
+            target_func = pickle.loads(state['target'].tobytes())
+        config = json.loads(str(state['config']))
+        config['mutation_type'] = Mutation(config['mutation_type'])
+        config['recombination_type'] = Recombination(config['recombination_type'])
+        config['selection_type'] = ParentSelection(config['selection_type'])
+        ea = cls.__new__(cls)
+        ea._configure(target_func, executor=executor, max_workers=max_workers, fitness_cache=fitness_cache, **config)
+        ea._restore_state(state)
+        if ea._adaptation is not None:
+            ea._adaptation.set_state({key[len('adaptation_'):]: value for key, value in state.items()
+                                      if key.startswith('adaptation_')})
+        ea._func_evals = int(state['func_evals'])
+        ea._trajectory_x = list(state['trajectory_x'])
+        ea._trajectory_fitness = state['trajectory_fitness'].tolist()
+        np.random.set_state(('MT19937', state['rng_keys'], int(state['rng_pos']), int(state['rng_has_gauss']),
+                             float(state['rng_cached_gaussian'])))
+        return ea
+
+    def _get_executor(self) -> Optional[Executor]:
+        """Lazily creates the executor used for evaluating offspring"""
+        if self._executor is None:
+            self._executor, self._owns_executor = make_executor(self._executor_type, self._max_workers)
+        return self._executor
+
+    def _num_workers(self) -> int:
+        """Number of workers of the executor, batches are split into one chunk per worker"""
+        return num_workers(self._get_executor(), self._max_workers)
+
+    def close(self) -> None:
+        """Shuts down the executor if it was created by the EA. It will be re-created when needed again"""
+        if self._owns_executor:
+            self._executor.shutdown()
+            self._executor, self._owns_executor = None, False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
 
     def get_average_fitness(self) -> float:
         """Helper to quickly access average population fitness"""
-        return np.mean(list(map(lambda x: x.fitness, self.population)))
+        return self._fitness_sum / len(self._population)
+
+    def get_fitness_array(self) -> np.ndarray:
+        """Sorted fitness values of the population as array. Cached until the population changes"""
+        if self._fitness_array is None:
+            self._fitness_array = np.array(self._fitness_keys)
+        return self._fitness_array
 
     def select_parents(self):
         """
@@ -194,81 +621,336 @@ class EA:
         For ease of computation we assume that the population members are sorted according to their fitness
         :return: list of ids of selected parents.
         """
-        parent_ids = []
-        if self.selection == ParentSelection.NEUTRAL:
-            parent_ids = np.random.choice(np.arange(self.pop_size), size=self.num_children)
-        elif self.selection == ParentSelection.FITNESS:
-            fitness_vec = np.array([pop.fitness for pop in self.population])
-            y = fitness_vec - np.max(fitness_vec)
-            fitness_prob = y / np.sum(y)
-            parent_ids = np.random.choice(np.arange(self.pop_size), size=self.num_children,
-                                          p=fitness_prob)
-        elif self.selection == ParentSelection.TOURNAMENT:
-            for _ in range(self.num_children):
-                chosen_parents_ind = np.random.choice(range(self.pop_size), replace=False,
-                                                  size=self.num_children)
-                chosen_parents = [self.population[i] for i in np.sort(chosen_parents_ind)]
-                parent_ids.append(np.argmin(np.array([pop.fitness for pop in chosen_parents])))
-        else:
-            raise NotImplementedError
-        self.logger.debug('Selected parents:')
-        self.logger.debug(parent_ids)
+        parent_ids = select_parent_ids(self.get_fitness_array(), self.selection, self.num_children,
+                                       self.tournament_size).tolist()
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug('Selected parents:')
+            self.logger.debug(parent_ids)
         return parent_ids
 
+    def _create_child(self, parent: Member, partners: List[Member]) -> Member:
+        """
+        Creates exactly one offspring of parent. The frac_mutants parameter determines if mutation or recombination
+        is performed
+        :param parent: Member to create the offspring from
+        :param partners: possible recombination partners (the selected parents)
+        :return: the (not yet evaluated) offspring
+        """
+        mutation = np.random.choice(["mutate", "recombine"], p=[self.frac_mutants, 1-self.frac_mutants])
+        if mutation == "mutate":
+            return parent.mutate()
+        elif mutation == "recombine":
+            partner = partners[np.random.choice(len(partners))]
+            return parent.recombine(partner)
+        raise NotImplementedError
+
+    def _adapt(self, children: List[Member]) -> None:
+        """Updates the mutation distribution of the CMA mutation types with the evaluated mutants among children"""
+        if self._adaptation is None:
+            return
+        mutants = [child for child in children if child._origin is not None]
+        if mutants:
+            self._adaptation.update(np.array([child._origin[0] for child in mutants]),
+                                    np.array([child.fitness < child._origin[1] for child in mutants]))
+        for child in mutants:
+            child._origin = None
+
     def step(self) -> float:
         """
-        Performs one step of parent selection -> offspring creation -> survival selection
+        Performs one step of parent selection -> offspring creation -> survival selection. The wall time of the
+        phases (selection, variation, evaluation, survival) is kept for the statistics logged by optimize
         :return: average population fittness
         """
+        start = time.perf_counter()
         # Step 2: Parent selection
         parent_ids = self.select_parents()
+        selected = time.perf_counter()
 
         # Step 3: Variation / create offspring
+        parents = [self._population[id] for id in parent_ids]
         children = []
-        for id in parent_ids:
-            # TODO for each parent create exactly one offspring (use the frac_mutants) parameter to determine
-            # if more recombination or mutation should be performed
-            mutation = np.random.choice(["mutate", "recombine"], p=[self.frac_mutants, 1-self.frac_mutants])
-            
-            if mutation == "mutate":
-                children.append(self.population[id].mutate())
-            elif mutation == "recombine":
-                partner = self.population[np.random.choice(parent_ids)]
-                children.append(self.population[id].recombine(partner))
-            else:
-                raise NotImplementedError
+        for parent in parents:
+            children.append(self._create_child(parent, parents))
             self._func_evals += 1
-        self.logger.debug('Children:')
-        self.logger.debug(children)
+        varied = time.perf_counter()
+        # all children of a generation are evaluated at once
+        evaluate_members(children, self._get_executor(), self._num_workers())
+        self._adapt(children)
+        evaluated = time.perf_counter()
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug('Children:')
+            self.logger.debug(children)
 
         # Step 4: Survival selection
-        # (\mu + \lambda)-selection i.e. combine offspring and parents in one sorted list, keep the #pop_size best
-        self.population.extend(children)
-        self.population.sort(key=lambda x: x.fitness)
-        self.population = self.population[:self.pop_size]
-        self.trajectory.append(self.population[0])
+        # (\mu + \lambda)-selection i.e. insert the offspring into the sorted population, keep the #pop_size best
+        for child in children:
+            self._insert(child)
+        self._record_trajectory()
+        self._phase_times = dict(selection=selected - start, variation=varied - selected,
+                                 evaluation=evaluated - varied, survival=time.perf_counter() - evaluated)
         return self.get_average_fitness()
 
-    def optimize(self):
+    def optimize(self, checkpoint_path: Optional[str] = None, checkpoint_interval: int = 10):
         """
-        Simple optimization loop that stops after a predetermined number of function evaluations
+        Simple optimization loop that stops after a predetermined number of function evaluations.
+        If the logger of the EA is enabled for INFO every step is logged. The log records carry the statistics of the
+        step as dict in the generation_stats attribute: step, average_fitness, best_fitness, func_evals, wall_time
+        and the wall time of the phases of the step (see step), e.g. to be collected by a GenerationStatsHandler
+        :param checkpoint_path: Optional file name. If given, a checkpoint is written every checkpoint_interval steps
+                                and when the optimization finishes (see save_checkpoint and resume)
+        :param checkpoint_interval: number of steps between two checkpoints
         :return:
         """
-        step = 1
-        while self._func_evals < self.max_func_evals:
-            avg_fitness = self.step()
-            self.logger.info(
-                'Step {:>3d} | Average fitness {:>10.7f} | Best fitness {:>10.7f} | #Func Evals: {:>4d}'.format(
-                    step, avg_fitness, self.population[0].fitness, self._func_evals))
-            step += 1
-        return self.population[0]
+        assert 0 < checkpoint_interval
+        step = len(self._trajectory_fitness)  # continues the count of a resumed run
+        try:
+            while self._func_evals < self.max_func_evals:
+                start = time.perf_counter()
+                avg_fitness = self.step()
+                if self.logger.isEnabledFor(logging.INFO):
+                    stats = dict(step=step, average_fitness=float(avg_fitness),
+                                 best_fitness=float(self.get_best_fitness()), func_evals=self._func_evals,
+                                 wall_time=time.perf_counter() - start, **self._phase_times)
+                    self.logger.info('Step %3d | Average fitness %10.7f | Best fitness %10.7f | #Func Evals: %4d',
+                                     step, avg_fitness, stats['best_fitness'], self._func_evals,
+                                     extra={'generation_stats': stats})
+                if checkpoint_path is not None and step % checkpoint_interval == 0:
+                    self.save_checkpoint(checkpoint_path)
+                step += 1
+            if checkpoint_path is not None:
+                self.save_checkpoint(checkpoint_path)
+        finally:
+            self.close()
+        return self.get_best_member()
+
+
+class VectorizedEA(EA):
+    """
+    Array based population engine for the EA.
+    Instead of one Member object per individual, all coordinates are stored in one (pop_size, dim) array and all
+    fitness values in one vector. Mutation, recombination, clipping and (mu + lambda)-selection are then performed
+    as whole-array operations. Takes the same arguments as EA.
+    """
+
+    def _init_population(self, initial_x: np.ndarray) -> None:
+        fitness = self._evaluate(initial_x)
+        order = np.argsort(fitness, kind='stable')
+        self._x = initial_x[order]
+        self._fitness = fitness[order]
+
+    def _evaluate(self, x: np.ndarray) -> np.ndarray:
+        """
+        Evaluates the target function for every row of x
+        :param x: (n, dim) array of coordinates
+        :return: (n,) array of fitness values
+        """
+        if self._cache is not None:
+            return self._cache.evaluate(self._f, x, self._get_executor(), self._num_workers())
+        return evaluate_batch(self._f, x, self._get_executor(), self._num_workers())
+
+    def _as_member(self, idx: int) -> Member:
+        return Member(self._x[idx], self._f, self._bounds, self._mutation, self._recombination,
+                      self._sigma, self._recom_prob, fitness=self._fitness[idx], fitness_cache=self._cache,
+                      adaptation=self._adaptation)
+
+    @property
+    def population(self) -> List[Member]:
+        """
+        Member view of the population, the members are created on every access. Only meant for inspection,
+        changes to the members are not written back. Assigning a list of members replaces the population arrays
+        """
+        return [self._as_member(i) for i in range(len(self._fitness))]
+
+    @population.setter
+    def population(self, members: List[Member]) -> None:
+        x = np.vstack([m.x_coordinate for m in members]).astype(float)
+        fitness = np.array([m.fitness for m in members], dtype=float)
+        order = np.argsort(fitness, kind='stable')
+        self._x = x[order]
+        self._fitness = fitness[order]
+
+    def _init_trajectory(self) -> None:
+        self._trajectory_x = [self._x[0].copy()]
+        self._trajectory_fitness = [self._fitness[0]]
+
+    def _record_trajectory(self) -> None:
+        self._trajectory_x.append(self._x[0].copy())
+        self._trajectory_fitness.append(self._fitness[0])
+
+    def _checkpoint_state(self) -> dict:
+        return dict(x=self._x, fitness=self._fitness)
+
+    def _restore_state(self, state: dict) -> None:
+        self._x = state['x']
+        self._fitness = state['fitness']
+
+    @property
+    def population_x(self) -> np.ndarray:
+        """(pop_size, dim) array of the sorted population coordinates"""
+        return self._x
+
+    @property
+    def population_fitness(self) -> np.ndarray:
+        """(pop_size,) array of the sorted population fitness values"""
+        return self._fitness
+
+    def emigrants(self, num_migrants: int) -> Tuple[np.ndarray, np.ndarray]:
+        return self._x[:num_migrants].copy(), self._fitness[:num_migrants].copy()
+
+    def immigrate(self, x: np.ndarray, fitness: np.ndarray) -> None:
+        x = np.concatenate((self._x, x))
+        fitness = np.concatenate((self._fitness, fitness))
+        survivors = np.argsort(fitness, kind='stable')[:self.pop_size]
+        self._x = x[survivors]
+        self._fitness = fitness[survivors]
+
+    def get_best_member(self) -> Member:
+        return self._as_member(0)
+
+    def get_best_fitness(self) -> float:
+        return self._fitness[0]
+
+    def get_average_fitness(self) -> float:
+        return float(np.mean(self._fitness))
+
+    def get_fitness_array(self) -> np.ndarray:
+        return self._fitness
+
+    def select_parents(self) -> np.ndarray:
+        """
+        Array version of EA.select_parents.
+        :return: array of ids of selected parents.
+        """
+        return select_parent_ids(self._fitness, self.selection, self.num_children, self.tournament_size)
+
+    def step(self) -> float:
+        """
+        Performs one step of parent selection -> offspring creation -> survival selection on the whole population
+        :return: average population fittness
+        """
+        start = time.perf_counter()
+        # Step 2: Parent selection
+        parent_ids = self.select_parents()
+        selected = time.perf_counter()
+
+        # Step 3: Variation / create offspring
+        mutants = np.random.random(len(parent_ids)) < self.frac_mutants
+        children = np.empty((len(parent_ids), self.dim))
+        parents_x = self._x[parent_ids[mutants]]
+        children[mutants] = mutate_batch(parents_x, self._mutation, self._bounds, self._sigma, self._adaptation)
+        recombinants = parent_ids[~mutants]
+        partners = np.random.choice(parent_ids, size=len(recombinants))
+        children[~mutants] = recombine_batch(self._x[recombinants], self._x[partners], self._recombination,
+                                             self._recom_prob, self._bounds)
+        varied = time.perf_counter()
+        children_fitness = self._evaluate(children)
+        self._func_evals += len(parent_ids)
+        if self._adaptation is not None:
+            self._adaptation.update((children[mutants] - parents_x) / self._adaptation.sigma,
+                                    children_fitness[mutants] < self._fitness[parent_ids[mutants]])
+        evaluated = time.perf_counter()
+
+        # Step 4: Survival selection
+        # (\mu + \lambda)-selection i.e. combine offspring and parents, keep the #pop_size best
+        x = np.concatenate((self._x, children))
+        fitness = np.concatenate((self._fitness, children_fitness))
+        survivors = np.argsort(fitness, kind='stable')[:self.pop_size]
+        self._x = x[survivors]
+        self._fitness = fitness[survivors]
+        self._record_trajectory()
+        self._phase_times = dict(selection=selected - start, variation=varied - selected,
+                                 evaluation=evaluated - varied, survival=time.perf_counter() - evaluated)
+        return self.get_average_fitness()
+
+
+class AsyncEA(EA):
+    """
+    Asynchronous steady-state variant of the EA.
+    Instead of evaluating whole generations, max_workers children (default: number of CPUs) are evaluated
+    concurrently. As soon as any evaluation finishes the child competes with the population ((mu + 1)-selection,
+    i.e. it is inserted into the sorted population and the worst member is dropped) and a new child is sent out.
+    Parents are drawn children_per_step at a time with the usual selection mechanism. Takes the same arguments as
+    EA, but evaluates on a thread pool if no executor is given.
+    """
+
+    def __init__(self, *args, **kwargs):
+        if kwargs.get('executor') is None:
+            kwargs['executor'] = 'thread'
+        super().__init__(*args, **kwargs)
+        self.n_workers = self._max_workers or os.cpu_count() or 1
+        self._parents = []
+        self._partners = []
+        self._pending = {}  # future -> child that is being evaluated
+
+    def _next_child(self) -> Member:
+        """Creates a child from the next selected parent, new parents are selected once all have been used"""
+        if not self._parents:
+            self._parents = [self._population[id] for id in self.select_parents()]
+            self._partners = list(self._parents)
+        return self._create_child(self._parents.pop(), self._partners)
+
+    def _submit(self, executor: Executor, child: Member) -> Future:
+        """Sends the child out for evaluation. Cache hits are returned as already finished futures"""
+        if self._cache is not None:
+            fitness = self._cache.lookup(child._f, child.x_coordinate)
+            if fitness is not None:
+                future = Future()
+                future.set_result(fitness)
+                return future
+        return executor.submit(child._f, child.x_coordinate)
+
+    def step(self) -> float:
+        """
+        One asynchronous step: keeps n_workers evaluations in flight (as far as the evaluation budget allows), waits
+        until at least one of them has finished and performs survival selection for every finished child.
+        optimize simply repeats this, so exactly max_func_evals evaluations are performed. The phases logged by
+        optimize are submission, waiting and survival.
+        :return: average population fittness
+        """
+        start = time.perf_counter()
+        executor = self._get_executor()
+        while len(self._pending) < self.n_workers and self._func_evals + len(self._pending) < self.max_func_evals:
+            child = self._next_child()
+            self._pending[self._submit(executor, child)] = child
+        submitted = time.perf_counter()
+        if not self._pending:  # budget exhausted
+            self._phase_times = dict(submission=submitted - start, waiting=0., survival=0.)
+            return self.get_average_fitness()
+        done, _ = wait(self._pending, return_when=FIRST_COMPLETED)
+        finished = time.perf_counter()
+        for future in done:
+            child = self._pending.pop(future)
+            child._fit = future.result()
+            child._x_changed = False
+            if self._cache is not None:
+                self._cache.store(child._f, child.x_coordinate, child._fit)
+            self._func_evals += 1
+            self._adapt([child])
+            self._insert(child)
+            self._record_trajectory()
+        self._phase_times = dict(submission=submitted - start, waiting=finished - submitted,
+                                 survival=time.perf_counter() - finished)
+        return self.get_average_fitness()
+
+    def _checkpoint_state(self) -> dict:
+        # evaluations in flight and the order in which they finish can not be restored
+        raise NotImplementedError
 
+    def close(self) -> None:
+        """Cancels evaluations that are still in flight and shuts down the executor if it was created by the EA"""
+        for future in self._pending:
+            future.cancel()
+        self._pending = {}
+        super().close()
 
 if __name__ == '__main__':
     """
     Simple main to give an example of how to use the EA
     """
-    from target_function import ackley
+    try:
+        from src.target_function import ackley
+    except ModuleNotFoundError:
+        from target_function import ackley
 
     np.random.seed(0)  # fix seed for comparisons sake
     logging.basicConfig(level=logging.INFO)
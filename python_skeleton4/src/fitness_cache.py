@@ -0,0 +1,121 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import Executor
+from typing import Optional
+
+import numpy as np
+
+try:
+    from src.target_function import evaluate_batch
+except ModuleNotFoundError:  # executed as a script from within src
+    from target_function import evaluate_batch
+
+
+class FitnessCache:
+    """
+    Bounded LRU cache of target function values, keyed by the target function and the bytes of the (optionally
+    quantized) coordinate. One cache can be shared by all members of an EA and across EA runs, e.g. to avoid
+    re-evaluating copies of parents (Recombination.NONE) or children clipped onto the same corner of the bounds.
+    The cache lives in the calling process and is thread-safe.
+    """
+
+    def __init__(self, max_size: int = 100_000, tolerance: float = 0.) -> None:
+        """
+        Init
+        :param max_size: maximum number of stored function values. The least recently used ones are dropped first
+        :param tolerance: quantization tolerance. Coordinates are rounded to multiples of tolerance before hashing,
+                          i.e. all coordinates in the same cell share the function value of the first one evaluated.
+                          0 only matches identical coordinates
+        """
+        assert 0 < max_size
+        assert 0 <= tolerance
+        self.max_size = max_size
+        self.tolerance = tolerance
+        self.hits = 0
+        self.misses = 0
+        self._values = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _key(self, target_function: callable, coordinate: np.ndarray) -> tuple:
+        coordinate = np.asarray(coordinate, dtype=float)
+        if self.tolerance > 0:
+            coordinate = np.round(coordinate / self.tolerance)
+        return target_function, (coordinate + 0.).tobytes()  # + 0. maps -0. to 0.
+
+    def lookup(self, target_function: callable, coordinate: np.ndarray) -> Optional[float]:
+        """
+        :return: the cached function value of coordinate or None. Counts as hit or miss
+        """
+        return self._get(self._key(target_function, coordinate))
+
+    def _get(self, key: tuple) -> Optional[float]:
+        with self._lock:
+            if key in self._values:
+                self.hits += 1
+                self._values.move_to_end(key)
+                return self._values[key]
+            self.misses += 1
+            return None
+
+    def store(self, target_function: callable, coordinate: np.ndarray, value: float) -> None:
+        """Stores a function value, dropping the least recently used one if the cache is full"""
+        key = self._key(target_function, coordinate)
+        with self._lock:
+            self._values[key] = value
+            self._values.move_to_end(key)
+            if len(self._values) > self.max_size:
+                self._values.popitem(last=False)
+
+    def evaluate(self, target_function: callable, coordinates: np.ndarray, executor: Optional[Executor] = None,
+                 num_chunks: int = 1) -> np.ndarray:
+        """
+        Cached version of target_function.evaluate_batch. Only the coordinates that are not cached (each distinct
+        one once) are passed on to the target function
+        :param target_function: target function
+        :param coordinates: (num_points, n) matrix with one coordinate per row
+        :param executor: Optional executor to evaluate the cache misses concurrently
+        :param num_chunks: see target_function.evaluate_batch
+        :return: (num_points, ) array of function values
+        """
+        coordinates = np.atleast_2d(coordinates)
+        values = np.empty(len(coordinates))
+        missing = {}  # key -> rows with this key
+        for row, coordinate in enumerate(coordinates):
+            key = self._key(target_function, coordinate)
+            if key in missing:  # duplicate within the batch, it is only evaluated once
+                with self._lock:
+                    self.hits += 1
+                missing[key].append(row)
+                continue
+            value = self._get(key)
+            if value is not None:
+                values[row] = value
+            else:
+                missing[key] = [row]
+        if missing:
+            first_rows = [rows[0] for rows in missing.values()]
+            new_values = evaluate_batch(target_function, coordinates[first_rows], executor, num_chunks)
+            for rows, value in zip(missing.values(), new_values):
+                values[rows] = value
+                self.store(target_function, coordinates[rows[0]], value)
+        return values
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of lookups that were answered from the cache"""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.
+
+    def clear(self) -> None:
+        """Drops all cached values and resets the counters"""
+        with self._lock:
+            self._values.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def __str__(self):
+        return "FitnessCache: size={}/{}, hits={}, misses={}".format(len(self), self.max_size, self.hits,
+                                                                     self.misses)
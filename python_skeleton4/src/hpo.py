@@ -1,8 +1,17 @@
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
+
 import numpy as np
 import logging
 from src.evolution import Mutation, ParentSelection, Recombination, EA
 from src.target_function import ackley
 
+# The search space of determine_best_hypers. Configurations are always tuples (mutation, selection, recombination)
+MUTATIONS = (Mutation.NONE, Mutation.UNIFORM, Mutation.GAUSSIAN)
+SELECTIONS = (ParentSelection.NEUTRAL, ParentSelection.FITNESS, ParentSelection.TOURNAMENT)
+RECOMBINATIONS = (Recombination.NONE, Recombination.UNIFORM, Recombination.INTERMEDIATE)
+
 
 def evaluate_black_box(mutation, selection, recombination):
     """
@@ -21,14 +30,84 @@ def evaluate_black_box(mutation, selection, recombination):
     return res.fitness
 
 
-def determine_best_hypers():
+def get_configurations(num_random: Optional[int] = None, seed: Optional[int] = None) -> List[Tuple]:
+    """
+    Configurations of the sweep
+    :param num_random: if None the full Mutation x ParentSelection x Recombination grid is returned, otherwise
+                       num_random configurations drawn from it without replacement
+    :param seed: seed for drawing the random subset
+    :return: list of (mutation, selection, recombination) tuples
+    """
+    grid = list(itertools.product(MUTATIONS, SELECTIONS, RECOMBINATIONS))
+    if num_random is None:
+        return grid
+    ids = np.random.RandomState(seed).choice(len(grid), size=min(num_random, len(grid)), replace=False)
+    return [grid[i] for i in np.sort(ids)]
+
+
+def _evaluate_task(task: Tuple) -> float:
+    """One repetition of one configuration. Module level so it can be sent to worker processes"""
+    configuration, seed = task
+    np.random.seed(seed)
+    return evaluate_black_box(*configuration)
+
+
+def run_sweep(configurations: Optional[List[Tuple]] = None, num_seeds: int = 20, seed: int = 0,
+              max_workers: Optional[int] = None) -> List[dict]:
     """
-    TODO implement either grid or random search to determine the best hyperparameter setting of your EA implementation
-    when overfitting to the ackley function. The only parameter values you have to consider are selection_type,
-    mutation_type and recombination type. You can treat the EA as a black-box by optimizing the black-box-function
-    above. Note: the order of your "configuration" has to be as stated below
+    Evaluates every configuration num_seeds times. Every (configuration, repetition) task gets its own seed derived
+    from seed, so the results do not depend on the number of workers or on the order in which tasks finish.
+    :param configurations: list of (mutation, selection, recombination) tuples, defaults to the full grid
+                           (see get_configurations)
+    :param num_seeds: repetitions per configuration
+    :param seed: base seed of the sweep
+    :param max_workers: number of worker processes. 1 runs everything in this process, None uses all CPUs
+    :return: table as list of rows (dicts with mutation, selection, recombination, mean, std and num_seeds),
+             sorted by mean performance (best first)
+    """
+    if configurations is None:
+        configurations = get_configurations()
+    task_seeds = np.random.SeedSequence(seed).spawn(len(configurations) * num_seeds)
+    tasks = [(configuration, int(task_seed.generate_state(1)[0])) for configuration, task_seed in
+             zip((c for c in configurations for _ in range(num_seeds)), task_seeds)]
+    if max_workers == 1:
+        performances = list(map(_evaluate_task, tasks))
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            performances = list(pool.map(_evaluate_task, tasks, chunksize=max(1, num_seeds // 2)))
+    performances = np.array(performances).reshape(len(configurations), num_seeds)
+
+    table = []
+    for (mutation, selection, recombination), perf in zip(configurations, performances):
+        table.append({'mutation': Mutation(mutation), 'selection': ParentSelection(selection),
+                      'recombination': Recombination(recombination), 'mean': float(np.mean(perf)),
+                      'std': float(np.std(perf)), 'num_seeds': num_seeds})
+    table.sort(key=lambda row: row['mean'])
+    return table
 
+
+def determine_best_hypers(num_seeds: int = 1, max_workers: Optional[int] = None):
+    """
+    Grid search to determine the best hyperparameter setting of the EA implementation when overfitting to the
+    ackley function. The only parameter values considered are selection_type, mutation_type and recombination type.
+    The EA is treated as a black-box by optimizing the black-box-function above.
+    The seed of the sweep is drawn from numpy's global random state, i.e. seeding numpy makes the result reproducible
+    :param num_seeds: repetitions per configuration
+    :param max_workers: number of worker processes (see run_sweep)
     :return: best configuration as tuple e.g. (mutation, selection, recombination) and performance value
     """
-    
+    table = run_sweep(num_seeds=num_seeds, seed=np.random.randint(2 ** 31 - 1), max_workers=max_workers)
+    best = table[0]
+    best_setting = (best['mutation'], best['selection'], best['recombination'])
+    best_perf = best['mean']
     return best_setting, best_perf
+
+
+if __name__ == '__main__':
+    """
+    Prints the table of a full sweep, e.g. python -m src.hpo
+    """
+    logging.basicConfig(level=logging.WARNING)
+    for row in run_sweep():
+        print('{:<12s} {:<12s} {:<14s} mean {:>10.7f} | std {:>10.7f}'.format(
+            row['mutation'].name, row['selection'].name, row['recombination'].name, row['mean'], row['std']))
@@ -0,0 +1,33 @@
+import json
+import logging
+from typing import Optional, TextIO
+
+
+class GenerationStatsHandler(logging.Handler):
+    """
+    Logging handler that collects the statistics EA.optimize attaches to its log record of every step
+    (see EA.optimize). All other records are ignored. E.g.
+        handler = GenerationStatsHandler()
+        logging.getLogger('EA').addHandler(handler)
+        EA(ackley).optimize()
+        handler.records  # one dict per step
+    """
+
+    def __init__(self, stream: Optional[TextIO] = None, level: int = logging.INFO) -> None:
+        """
+        Init
+        :param stream: Optional text stream, every record is additionally written to it as one line of json
+        :param level: minimum level of the collected records
+        """
+        super().__init__(level)
+        self.stream = stream
+        self.records = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        stats = getattr(record, 'generation_stats', None)
+        if stats is None:
+            return
+        stats = dict(stats, logger=record.name)
+        self.records.append(stats)
+        if self.stream is not None:
+            self.stream.write(json.dumps(stats) + '\n')
@@ -0,0 +1,258 @@
+from enum import IntEnum
+from typing import List, Optional, Tuple
+import multiprocessing
+import numpy as np
+import logging
+
+try:
+    from src.evolution import EA, Member, Mutation, Recombination
+except ModuleNotFoundError:  # executed as a script from within src
+    from evolution import EA, Member, Mutation, Recombination
+
+
+class Topology(IntEnum):
+    RING = 0  # island i sends its migrants to island i + 1
+    FULLY_CONNECTED = 1  # every island sends its migrants to all other islands
+
+
+def migration_sources(topology: Topology, num_islands: int) -> List[List[int]]:
+    """
+    Which islands send migrants to which
+    :param topology: migration topology
+    :param num_islands: number of islands
+    :return: list with the ids of the source islands for every island
+    """
+    if topology == Topology.RING:
+        return [[(i - 1) % num_islands] if num_islands > 1 else [] for i in range(num_islands)]
+    elif topology == Topology.FULLY_CONNECTED:
+        return [[j for j in range(num_islands) if j != i] for i in range(num_islands)]
+    raise NotImplementedError
+
+
+class _Island:
+    """
+    One population of the island model. Owns its EA and its own numpy random state, so an island evolves the same
+    no matter whether it runs in its own process or together with the other islands in the calling process
+    """
+
+    def __init__(self, engine: type, target_func: callable, settings: dict, seed: int) -> None:
+        state = np.random.get_state()
+        np.random.seed(seed)
+        try:
+            self.ea = engine(target_func, **settings)
+        finally:
+            self._state = np.random.get_state()
+            np.random.set_state(state)
+
+    def call(self, method: str, *args):
+        """Calls one of the methods below with the random state of this island"""
+        state = np.random.get_state()
+        np.random.set_state(self._state)
+        try:
+            return getattr(self, method)(*args)
+        finally:
+            self._state = np.random.get_state()
+            np.random.set_state(state)
+
+    def evolve(self, max_func_evals: int, num_migrants: int) -> Tuple[np.ndarray, np.ndarray, int]:
+        """
+        Steps the EA until it has used max_func_evals evaluations
+        :return: coordinates and fitness values of the emigrants and the number of used function evaluations
+        """
+        while self.ea._func_evals < max_func_evals:
+            self.ea.step()
+        return self.ea.emigrants(num_migrants) + (self.ea._func_evals, )
+
+    def immigrate(self, x: np.ndarray, fitness: np.ndarray) -> None:
+        self.ea.immigrate(x, fitness)
+
+    def close(self) -> None:
+        self.ea.close()
+
+
+def _island_worker(connection, engine: type, target_func: callable, settings: dict, seed: int) -> None:
+    """
+    Main loop of an island process. Receives (method, args) tuples from the IslandModel and sends back the results,
+    (None, ()) ends the process. Only arrays and numbers are sent, the EA and its members never leave the process
+    """
+    try:
+        island = _Island(engine, target_func, settings, seed)
+    except Exception as e:
+        connection.send(e)
+        return
+    connection.send(None)
+    while True:
+        method, args = connection.recv()
+        if method is None:
+            island.close()
+            break
+        try:
+            connection.send(island.call(method, *args))
+        except Exception as e:
+            connection.send(e)
+
+
+class IslandModel:
+    """
+    Island model of the EA.
+    Every island is an independent EA (with its own operator settings) that runs in its own process. Every
+    migration_interval function evaluations (per island) each island sends copies of its num_migrants best members
+    to its neighbours in the topology, which insert them through their usual survival selection. Migrants are sent
+    as coordinate and fitness arrays only.
+    """
+
+    def __init__(self, target_func: callable, island_settings: List[dict], topology: Topology = Topology.RING,
+                 migration_interval: int = 100, num_migrants: int = 2,
+                 total_number_of_function_evaluations: int = 2000, engine: type = EA, processes: bool = True,
+                 seed: Optional[int] = None):
+        """
+        Init
+        :param target_func: callable target function we optimize. Has to be picklable if processes is True
+        :param island_settings: one dict of EA keyword arguments (e.g. population_size, problem_dim, mutation_type,
+                                selection_type, ...) per island. total_number_of_function_evaluations is set by the
+                                island model
+        :param topology: migration topology
+        :param migration_interval: number of function evaluations of every island between two migrations
+        :param num_migrants: number of members every island sends per migration
+        :param total_number_of_function_evaluations: maximum allowed function evaluations, split evenly over the
+                                                     islands
+        :param engine: EA class of the islands, e.g. EA or VectorizedEA
+        :param processes: run every island in its own process. If False all islands run in the calling process,
+                          which gives the same results
+        :param seed: seed of the island random states. Drawn from numpy's global random state if None
+        """
+        assert len(island_settings) > 0
+        assert 0 < migration_interval
+        assert 0 <= num_migrants
+        assert all('total_number_of_function_evaluations' not in settings for settings in island_settings)
+        self._f = target_func
+        self.num_islands = len(island_settings)
+        self._settings = island_settings
+        self.topology = topology
+        self._sources = migration_sources(topology, self.num_islands)
+        self.migration_interval = migration_interval
+        self.num_migrants = num_migrants
+        self.max_func_evals = total_number_of_function_evaluations
+        self._evals_per_island = total_number_of_function_evaluations // self.num_islands
+        self._func_evals = 0
+        self.logger = logging.getLogger(self.__class__.__name__)
+        if seed is None:
+            seed = np.random.randint(2 ** 31 - 1)
+        seeds = [int(s.generate_state(1)[0]) for s in np.random.SeedSequence(seed).spawn(self.num_islands)]
+        settings = [dict(s, total_number_of_function_evaluations=self._evals_per_island) for s in island_settings]
+        self._islands, self._connections, self._processes = [], [], []
+        if processes:
+            for island_kwargs, island_seed in zip(settings, seeds):
+                connection, child_connection = multiprocessing.Pipe()
+                process = multiprocessing.Process(target=_island_worker, daemon=True,
+                                                  args=(child_connection, engine, target_func, island_kwargs,
+                                                        island_seed))
+                process.start()
+                self._connections.append(connection)
+                self._processes.append(process)
+            self._receive_all()
+        else:
+            self._islands = [_Island(engine, target_func, s, island_seed) for s, island_seed in zip(settings, seeds)]
+        self.best_x, self.best_fitness, self.best_island = None, np.inf, -1
+        self.trajectory_fitness = []  # best fitness over all islands after every migration
+
+    def _receive_all(self) -> list:
+        results = [connection.recv() for connection in self._connections]
+        for result in results:
+            if isinstance(result, Exception):
+                self.close()
+                raise result
+        return results
+
+    def _call_all(self, method: str, args: List[tuple]) -> list:
+        """Calls method on every island with the corresponding args. Islands in processes run concurrently"""
+        if self._islands:
+            return [island.call(method, *a) for island, a in zip(self._islands, args)]
+        for connection, a in zip(self._connections, args):
+            connection.send((method, a))
+        return self._receive_all()
+
+    def _migrate(self, emigrants: List[Tuple[np.ndarray, np.ndarray]]) -> None:
+        """Sends the emigrants of every island to its neighbours"""
+        immigrants = []
+        for sources in self._sources:
+            if sources:
+                immigrants.append((np.concatenate([emigrants[i][0] for i in sources]),
+                                   np.concatenate([emigrants[i][1] for i in sources])))
+            else:
+                immigrants.append((np.empty((0, emigrants[0][0].shape[1])), np.empty(0)))
+        self._call_all('immigrate', immigrants)
+
+    def step(self) -> float:
+        """
+        Evolves all islands for migration_interval function evaluations and performs one migration
+        :return: best fitness over all islands
+        """
+        limit = min(self._evals_per_island, self.migration_interval * (len(self.trajectory_fitness) + 1))
+        results = self._call_all('evolve', [(limit, max(1, self.num_migrants))] * self.num_islands)
+        self._func_evals = sum(result[2] for result in results)
+        for island, (x, fitness, _) in enumerate(results):
+            if fitness[0] < self.best_fitness:
+                self.best_x, self.best_fitness, self.best_island = x[0].copy(), fitness[0], island
+        if self.num_migrants > 0:
+            self._migrate([(x[:self.num_migrants], fitness[:self.num_migrants]) for x, fitness, _ in results])
+        self.trajectory_fitness.append(self.best_fitness)
+        return self.best_fitness
+
+    def optimize(self) -> Member:
+        """
+        Runs the islands until the evaluation budget is used up
+        :return: the best member found on any island
+        """
+        step = 1
+        try:
+            while self.migration_interval * (step - 1) < self._evals_per_island:
+                best_fitness = self.step()
+                self.logger.info('Migration %3d | Best fitness %10.7f (island %d) | #Func Evals: %5d',
+                                 step, best_fitness, self.best_island, self._func_evals)
+                step += 1
+        finally:
+            self.close()
+        settings = self._settings[self.best_island]
+        return Member(self.best_x, self._f, settings.get('problem_bounds', [-30, 30]),
+                      settings.get('mutation_type', Mutation.UNIFORM),
+                      settings.get('recombination_type', Recombination.INTERMEDIATE), fitness=self.best_fitness)
+
+    def close(self) -> None:
+        """Shuts down the island processes"""
+        for connection, process in zip(self._connections, self._processes):
+            if process.is_alive():
+                connection.send((None, ()))
+            process.join()
+            connection.close()
+        self._connections, self._processes = [], []
+        for island in self._islands:
+            island.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+if __name__ == '__main__':
+    """
+    Four differently configured islands on a ring, one process each
+    """
+    try:
+        from src.evolution import ParentSelection
+        from src.target_function import ackley
+    except ModuleNotFoundError:
+        from evolution import ParentSelection
+        from target_function import ackley
+
+    logging.basicConfig(level=logging.INFO)
+    common = dict(population_size=20, problem_dim=10)
+    islands = IslandModel(ackley, [
+        dict(common, mutation_type=Mutation.GAUSSIAN, selection_type=ParentSelection.TOURNAMENT),
+        dict(common, mutation_type=Mutation.GAUSSIAN, sigma=.1, selection_type=ParentSelection.FITNESS),
+        dict(common, mutation_type=Mutation.UNIFORM, recombination_type=Recombination.UNIFORM),
+        dict(common, mutation_type=Mutation.GAUSSIAN, sigma=3., fraction_mutation=.8)],
+        Topology.RING, total_number_of_function_evaluations=40_000, seed=0)
+    print(islands.optimize())
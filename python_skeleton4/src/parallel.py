@@ -0,0 +1,33 @@
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional, Tuple, Union
+
+
+def make_executor(executor: Union[None, str, Executor], max_workers: Optional[int] = None) \
+        -> Tuple[Optional[Executor], bool]:
+    """
+    Helper to turn the executor option of the optimizers into an actual concurrent.futures.Executor
+    :param executor: None (serial evaluation), 'thread', 'process' or a user provided Executor
+    :param max_workers: number of workers if a new thread or process pool is created
+    :return: the executor (or None) and whether it was created here, i.e. whether the caller has to shut it down
+    """
+    if executor is None or isinstance(executor, Executor):
+        return executor, False
+    elif executor == 'thread':
+        return ThreadPoolExecutor(max_workers=max_workers), True
+    elif executor == 'process':
+        return ProcessPoolExecutor(max_workers=max_workers), True
+    raise NotImplementedError
+
+
+def num_workers(executor: Optional[Executor], max_workers: Optional[int] = None) -> int:
+    """
+    Number of workers an executor evaluates on. Used to split batches into one chunk per worker
+    :param executor: the executor (None means serial evaluation)
+    :param max_workers: worker count requested by the user, if known
+    :return: max_workers if given, otherwise the worker count of thread and process pools and the number of CPUs
+             for other executors
+    """
+    if executor is None:
+        return 1
+    return max_workers or getattr(executor, '_max_workers', None) or os.cpu_count() or 1
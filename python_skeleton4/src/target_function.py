@@ -1,19 +1,91 @@
+from concurrent.futures import Executor
+from functools import partial
+from typing import Optional
+
 import numpy as np
 
 
+def batch_target(func: callable) -> callable:
+    """
+    Decorator to mark target functions that follow the batch evaluation contract, i.e. besides a single
+    n-dimensional coordinate they also accept a (num_points, n) matrix and return num_points function values.
+    :param func: target function
+    :return: the same function, marked as batch capable
+    """
+    func.supports_batch = True
+    return func
+
+
+def evaluate_batch(func: callable, coordinates: np.ndarray, executor: Optional[Executor] = None,
+                   num_chunks: int = 1) -> np.ndarray:
+    """
+    Evaluates a target function on many points. Batch capable target functions (see batch_target) are called only
+    once, all others are called once per point.
+    If an executor is given the evaluations are distributed over its workers. Point-wise target functions are
+    submitted one point per task, batch capable ones in num_chunks chunks of points. The order of the results always
+    matches the order of the coordinates.
+    :param func: target function
+    :param coordinates: (num_points, n) matrix with one coordinate per row
+    :param executor: Optional concurrent.futures.Executor used to evaluate the points concurrently
+    :param num_chunks: number of chunks batch capable target functions are split into, usually the number of
+                       workers of the executor (see parallel.num_workers)
+    :return: (num_points, ) array of function values
+    """
+    coordinates = np.atleast_2d(coordinates)
+    if executor is not None and len(coordinates) > 1:
+        if getattr(func, 'supports_batch', False):
+            chunks = np.array_split(coordinates, max(1, min(len(coordinates), num_chunks)))
+            return np.concatenate(list(executor.map(partial(evaluate_batch, func), chunks)))
+        return np.array(list(executor.map(func, coordinates)), dtype=float)
+    if getattr(func, 'supports_batch', False):
+        return np.asarray(func(coordinates), dtype=float).reshape(len(coordinates))
+    return np.array([func(c) for c in coordinates], dtype=float)
+
+
+@batch_target
 def ackley(coordinate: np.ndarray) -> float:
-    
+
     """
     n-dimensional Ackley function. Bounded by -30 <= coordinate[i] <= 30
-    :param coordinate: n-dimensional numpy array with dtype float
-    :return: function value at the given coordinate
+    :param coordinate: n-dimensional numpy array with dtype float or a (num_points, n) matrix of coordinates
+    :return: function value at the given coordinate or (num_points, ) array of function values
     """
-    
+
     assert np.all((-30 <= coordinate) & (coordinate <= 30)), 'Coordinates have to be in [-30, 30]'
-    first_sum = 0.0
-    second_sum = 0.0
-    for c in coordinate:
-        first_sum += c ** 2.0
-        second_sum += np.cos(2.0 * np.pi * c)
-    n = float(len(coordinate))
+    n = float(coordinate.shape[-1])
+    first_sum = np.sum(coordinate ** 2.0, axis=-1)
+    second_sum = np.sum(np.cos(2.0 * np.pi * coordinate), axis=-1)
     return -20.0 * np.exp(-0.2 * np.sqrt(first_sum / n)) - np.exp(second_sum / n) + 20 + np.e
+
+
+@batch_target
+def sphere(coordinate: np.ndarray) -> float:
+    """
+    n-dimensional sphere function, minimum 0 at the origin
+    :param coordinate: n-dimensional numpy array with dtype float or a (num_points, n) matrix of coordinates
+    :return: function value at the given coordinate or (num_points, ) array of function values
+    """
+    return np.sum(coordinate ** 2.0, axis=-1)
+
+
+@batch_target
+def rastrigin(coordinate: np.ndarray) -> float:
+    """
+    n-dimensional Rastrigin function, minimum 0 at the origin. Usually bounded by -5.12 <= coordinate[i] <= 5.12
+    :param coordinate: n-dimensional numpy array with dtype float or a (num_points, n) matrix of coordinates
+    :return: function value at the given coordinate or (num_points, ) array of function values
+    """
+    n = float(coordinate.shape[-1])
+    return 10 * n + np.sum(coordinate ** 2.0 - 10 * np.cos(2.0 * np.pi * coordinate), axis=-1)
+
+
+@batch_target
+def rosenbrock(coordinate: np.ndarray) -> float:
+    """
+    n-dimensional Rosenbrock function (n >= 2), minimum 0 at (1, ..., 1). Usually bounded by
+    -5 <= coordinate[i] <= 10
+    :param coordinate: n-dimensional numpy array with dtype float or a (num_points, n) matrix of coordinates
+    :return: function value at the given coordinate or (num_points, ) array of function values
+    """
+    x, x_next = coordinate[..., :-1], coordinate[..., 1:]
+    return np.sum(100.0 * (x_next - x ** 2.0) ** 2.0 + (1 - x) ** 2.0, axis=-1)
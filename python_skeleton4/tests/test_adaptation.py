@@ -0,0 +1,80 @@
+import unittest
+import logging
+import numpy as np
+
+from src.adaptation import CovarianceAdaptation
+from src.evolution import EA, AsyncEA, Mutation, ParentSelection, VectorizedEA
+from src.target_function import batch_target
+
+
+@batch_target
+def ellipsoid(coordinate):
+    """Ill-conditioned quadratic, the axes are scaled from 1 to 1e6"""
+    weights = 10 ** (6 * np.arange(coordinate.shape[-1]) / (coordinate.shape[-1] - 1))
+    return np.sum(weights * coordinate ** 2, axis=-1)
+
+
+class TestCovarianceAdaptation(unittest.TestCase):
+    """
+    Tests for the CMA mutation types
+    """
+
+    def setUp(self):  # This Method is executed once before each test
+        logging.basicConfig(level=logging.DEBUG)
+        np.random.seed(0)
+
+    def test_step_size(self):
+        """Test sigma shrinks without successes and grows if every mutant succeeds"""
+        for diagonal in [True, False]:
+            adaptation = CovarianceAdaptation(3, 1., [-30, 30], diagonal)
+            children, steps = adaptation.sample(np.zeros((10, 3)))
+            self.assertTrue(np.allclose(children, steps))
+            for _ in range(10):
+                adaptation.update(steps, np.zeros(10, dtype=bool))
+            self.assertLess(adaptation.sigma, 1.)
+            sigma = adaptation.sigma
+            for _ in range(50):
+                adaptation.update(steps, np.ones(10, dtype=bool))
+            self.assertGreater(adaptation.sigma, sigma)
+
+    def test_covariance(self):
+        """Test the covariance learns the direction of successful steps and keeps its trace"""
+        adaptation = CovarianceAdaptation(2, 1., [-30, 30])
+        for _ in range(200):
+            adaptation.update(np.random.normal(size=(10, 1)) * [[1., 1.]], np.ones(10, dtype=bool))
+        eigenvalues, eigenvectors = np.linalg.eigh(adaptation.covariance)
+        self.assertAlmostEqual(2., np.sum(eigenvalues))
+        self.assertTrue(np.allclose(np.abs(eigenvectors[:, -1]), np.sqrt([.5, .5]), atol=.05))
+        self.assertTrue(eigenvalues[-1] > 10 * eigenvalues[0])
+        steps = adaptation.sample(np.zeros((1_000, 2)))[1]
+        self.assertGreater(np.corrcoef(steps.T)[0, 1], .9)
+
+        adaptation = CovarianceAdaptation(2, 1., [-30, 30], diagonal=True)
+        for _ in range(50):
+            adaptation.update(np.random.normal(size=(10, 2)) * [3., .1], np.ones(10, dtype=bool))
+        self.assertEqual((2,), adaptation.covariance.shape)
+        self.assertGreater(adaptation.covariance[0], 10 * adaptation.covariance[1])
+
+    def test_ill_conditioned(self):
+        """Test the adapted mutation beats fixed gaussian mutation on an ill-conditioned problem with the same budget"""
+        settings = dict(population_size=10, problem_dim=10, problem_bounds=[-5, 5], fraction_mutation=1.,
+                        selection_type=ParentSelection.TOURNAMENT, total_number_of_function_evaluations=3_000,
+                        children_per_step=10)
+        for engine in [EA, VectorizedEA]:
+            best = {}
+            for mutation in [Mutation.GAUSSIAN, Mutation.CMA, Mutation.CMA_DIAGONAL]:
+                np.random.seed(0)
+                ea = engine(ellipsoid, mutation_type=mutation, **settings)
+                best[mutation] = ea.optimize().fitness
+                self.assertEqual(3_000, ea._func_evals)
+                self.assertEqual(300, len(ea.trajectory_fitness))
+            self.assertLess(best[Mutation.CMA], best[Mutation.GAUSSIAN] / 10)
+            self.assertLess(best[Mutation.CMA_DIAGONAL], best[Mutation.GAUSSIAN] / 1_000)
+        with AsyncEA(ellipsoid, mutation_type=Mutation.CMA_DIAGONAL, max_workers=2, **settings) as ea:
+            sigma = ea._adaptation.sigma
+            self.assertLess(ea.optimize().fitness, best[Mutation.GAUSSIAN])
+            self.assertNotEqual(sigma, ea._adaptation.sigma)
+
+
+if __name__ == '__main__':
+    unittest.main()
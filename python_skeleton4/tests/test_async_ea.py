@@ -0,0 +1,80 @@
+import unittest
+import logging
+import threading
+import time
+
+import numpy as np
+
+from src.evolution import AsyncEA, Mutation, ParentSelection, Recombination
+from src.target_function import ackley
+
+
+class SlowAckley:
+    """
+    ackley with varying evaluation times that records how many evaluations run at the same time.
+    The first two evaluations wait for each other, so overlap is guaranteed and not left to timing
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.rng = np.random.default_rng(0)  # own generator, the EA uses the global one in the main thread
+        self.overlap = threading.Barrier(2, timeout=10)
+        self.calls = 0
+        self.running = 0
+        self.max_running = 0
+
+    def __call__(self, x):
+        with self.lock:
+            self.calls += 1
+            first_calls = self.calls <= 2
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+            delay = self.rng.uniform(0, 0.002)
+        if first_calls:
+            self.overlap.wait()
+        time.sleep(delay)
+        with self.lock:
+            self.running -= 1
+        return ackley(x)
+
+
+class TestAsyncEA(unittest.TestCase):
+    """
+    Simple tests for the asynchronous steady-state EA
+    """
+
+    def setUp(self):  # This Method is executed once before each test
+        logging.basicConfig(level=logging.DEBUG)
+        np.random.seed(0)
+
+    def test_async_optimization(self):
+        target = SlowAckley()
+        ea = AsyncEA(target, 10, 2, selection_type=ParentSelection.TOURNAMENT, mutation_type=Mutation.GAUSSIAN,
+                     recombination_type=Recombination.INTERMEDIATE, problem_bounds=[-10, 10],
+                     total_number_of_function_evaluations=300, max_workers=4)
+        initial = ea.get_average_fitness()
+        best = ea.optimize()
+        self.assertEqual(300, ea._func_evals)  # no overshooting of the budget
+        self.assertEqual(1 + 300 - 10, len(ea.trajectory))  # one entry per finished evaluation
+        self.assertEqual(10, len(ea.population))
+        fitness = [m.fitness for m in ea.population]
+        self.assertListEqual(sorted(fitness), fitness)
+        self.assertListEqual(fitness, ea._fitness_keys)
+        self.assertLess(ea.get_average_fitness(), initial)
+        self.assertEqual(best.fitness, fitness[0])
+        self.assertTrue(2 <= target.max_running <= 4)
+        self.assertIsNone(ea._executor)
+
+    def test_step(self):
+        """Test a single step collects at least one finished evaluation and keeps the workers busy"""
+        ea = AsyncEA(SlowAckley(), 10, 2, total_number_of_function_evaluations=20, max_workers=4)
+        with ea:
+            ea.step()
+            self.assertTrue(11 <= ea._func_evals <= 14)
+            self.assertEqual(ea._func_evals - 10 + 1, len(ea.trajectory))
+            self.assertTrue(len(ea._pending) <= 4)
+        self.assertDictEqual({}, ea._pending)
+
+
+if __name__ == '__main__':
+    unittest.main()
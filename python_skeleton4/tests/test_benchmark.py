@@ -0,0 +1,46 @@
+import json
+import os
+import tempfile
+import unittest
+import numpy as np
+
+from src.benchmark import find_regressions, run_benchmarks
+from src.evolution import Mutation, ParentSelection, Recombination
+
+
+class TestBenchmark(unittest.TestCase):
+    """
+    Simple tests for the benchmark harness
+    """
+
+    def setUp(self):  # This Method is executed once before each test
+        np.random.seed(0)
+
+    def test_run_benchmarks(self):
+        """Test one record per configuration is written and regressions are detected"""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'benchmark.json')
+            results = run_benchmarks([2], [6], [3], ['sphere'], ['EA', 'VectorizedEA'], num_generations=2,
+                                     output=path)
+            with open(path) as file:
+                self.assertEqual(results, json.load(file))
+        self.assertEqual(2 * len(Mutation) * len(Recombination) * len(ParentSelection), len(results['ea']))
+        self.assertEqual(1, len(results['operators']))
+        for record in results['ea']:
+            self.assertGreater(record['evals_per_second'], 0)
+            self.assertGreater(record['time_per_generation'], 0)
+            self.assertGreater(record['peak_memory'], 0)
+        self.assertIn('mutate_gaussian', results['operators'][0])
+        self.assertIn('select_parents_tournament', results['operators'][0])
+
+        self.assertListEqual([], find_regressions(results, results))
+        faster = json.loads(json.dumps(results))
+        faster['ea'][0]['time_per_generation'] /= 2
+        regressions = find_regressions(faster, results)
+        self.assertEqual(1, len(regressions))
+        self.assertEqual('EA', regressions[0]['engine'])
+        self.assertEqual('time_per_generation', regressions[0]['metric'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import os
+import tempfile
+import unittest
+import logging
+import numpy as np
+
+from src.evolution import EA, AsyncEA, Mutation, ParentSelection, VectorizedEA
+from src.target_function import ackley
+
+
+class CrashingAckley:
+    """Point-wise ackley that fails after a number of evaluations, like a long run that gets killed"""
+
+    def __init__(self, max_calls):
+        self.max_calls = max_calls
+        self.calls = 0
+
+    def __call__(self, coordinate):
+        self.calls += 1
+        if self.calls > self.max_calls:
+            raise RuntimeError('crash')
+        return ackley(coordinate)
+
+
+class TestCheckpoint(unittest.TestCase):
+    """
+    Tests for checkpointing and resuming the EA
+    """
+
+    def setUp(self):  # This Method is executed once before each test
+        logging.basicConfig(level=logging.DEBUG)
+        np.random.seed(0)
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'ea.npz')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_resume_after_crash(self):
+        """Test a resumed run continues exactly like the uninterrupted run"""
+        for engine, mutation in [(EA, Mutation.GAUSSIAN), (VectorizedEA, Mutation.GAUSSIAN), (EA, Mutation.CMA),
+                                 (VectorizedEA, Mutation.CMA_DIAGONAL)]:
+            settings = dict(population_size=10, problem_dim=3, mutation_type=mutation,
+                            selection_type=ParentSelection.TOURNAMENT, total_number_of_function_evaluations=300)
+            np.random.seed(0)
+            reference = engine(ackley, **settings)
+            reference.optimize()
+
+            np.random.seed(0)
+            ea = engine(CrashingAckley(200), **settings)
+            with self.assertRaises(RuntimeError):
+                ea.optimize(checkpoint_path=self.path, checkpoint_interval=3)
+            self.assertFalse(os.path.exists(self.path + '.tmp'))
+            np.random.seed(1)  # the random state is part of the checkpoint
+            resumed = engine.resume(self.path, ackley)
+            self.assertLess(resumed._func_evals, 200)
+            resumed.optimize()
+            self.assertEqual(reference._func_evals, resumed._func_evals)
+            self.assertTrue(np.array_equal(reference.trajectory_x, resumed.trajectory_x))
+            self.assertTrue(np.array_equal(reference.trajectory_fitness, resumed.trajectory_fitness))
+            self.assertTrue(np.array_equal(reference.get_fitness_array(), resumed.get_fitness_array()))
+            self.assertEqual(reference.get_average_fitness(), resumed.get_average_fitness())
+
+    def test_checkpoint_contents(self):
+        """Test the target function and hyperparameters are restored and async runs refuse to checkpoint"""
+        ea = EA(ackley, 5, 2, selection_type=ParentSelection.FITNESS, total_number_of_function_evaluations=50)
+        ea.optimize(checkpoint_path=self.path)
+        resumed = EA.resume(self.path)
+        self.assertIs(ackley, resumed._f)
+        self.assertEqual(ParentSelection.FITNESS, resumed.selection)
+        self.assertEqual(50, resumed._func_evals)
+        self.assertEqual(len(ea.trajectory), len(resumed.trajectory))
+        EA(lambda x: ackley(x), 5, 2).save_checkpoint(self.path)  # lambdas can't be pickled
+        with self.assertRaises(AssertionError):
+            EA.resume(self.path)
+        self.assertEqual(5, EA.resume(self.path, ackley)._func_evals)
+        with AsyncEA(ackley, 5, 2) as ea:
+            with self.assertRaises(NotImplementedError):
+                ea.save_checkpoint(self.path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import threading
+import unittest
+import logging
+import numpy as np
+
+from src.evolution import EA, AsyncEA, VectorizedEA, Member, Mutation, Recombination
+from src.fitness_cache import FitnessCache
+from src.target_function import ackley
+
+
+class CountingAckley:
+    """ackley that counts how many points were actually evaluated"""
+
+    def __init__(self):
+        self.lock = threading.Lock()  # AsyncEA evaluates on a thread pool
+        self.evaluations = 0
+
+    def __call__(self, x):
+        with self.lock:
+            self.evaluations += 1
+        return ackley(x)
+
+
+class TestFitnessCache(unittest.TestCase):
+    """
+    Simple tests for the shared fitness cache
+    """
+
+    def setUp(self):  # This Method is executed once before each test
+        logging.basicConfig(level=logging.DEBUG)
+        np.random.seed(0)
+
+    def test_lru(self):
+        """Test hits, misses and that the least recently used value is dropped first"""
+        cache = FitnessCache(max_size=2)
+        cache.evaluate(ackley, np.array([[0.], [1.], [0.]]))
+        self.assertEqual((1, 2), (cache.hits, cache.misses))  # duplicates within a batch are evaluated once
+        cache.lookup(ackley, np.array([0.]))  # 0 is now more recently used than 1
+        cache.evaluate(ackley, np.array([[2.]]))
+        self.assertEqual(2, len(cache))
+        self.assertIsNotNone(cache.lookup(ackley, np.array([0.])))
+        self.assertIsNone(cache.lookup(ackley, np.array([1.])))
+        self.assertIsNone(cache.lookup(sum, np.array([0.])))  # values are stored per target function
+
+    def test_tolerance(self):
+        """Test coordinates within the quantization tolerance share one value"""
+        cache = FitnessCache(tolerance=1e-3)
+        values = cache.evaluate(ackley, np.array([[1., 1.], [1.0001, 0.9999], [1.01, 1.]]))
+        self.assertEqual(values[0], values[1])
+        self.assertNotEqual(values[0], values[2])
+        self.assertEqual(1, cache.hits)
+
+    def test_member_copies(self):
+        """Test copies of a parent (Recombination.NONE) and clipped mutants are not re-evaluated"""
+        target = CountingAckley()
+        cache = FitnessCache()
+        parent = Member(np.array([-1, -1]), target, [-1, 1], Mutation.GAUSSIAN, Recombination.NONE, sigma=10,
+                        fitness_cache=cache)
+        parent.fitness
+        for _ in range(10):
+            parent.recombine(parent).fitness
+        self.assertEqual(1, target.evaluations)
+        # with a huge sigma almost all mutants land on one of the 4 corners
+        for _ in range(100):
+            parent.mutate().fitness
+        self.assertLess(target.evaluations, 30)
+        self.assertEqual(111, cache.hits + cache.misses)
+        self.assertEqual(target.evaluations, cache.misses)
+
+    def test_shared_across_runs(self):
+        """Test a cache shared by several EA runs on the same target and the evaluation accounting"""
+        target = CountingAckley()
+        cache = FitnessCache()
+        for engine in [EA, VectorizedEA, AsyncEA]:
+            ea = engine(target, 10, 1, problem_bounds=[-1, 1], mutation_type=Mutation.GAUSSIAN, sigma=10,
+                        recombination_type=Recombination.NONE, total_number_of_function_evaluations=200,
+                        fitness_cache=cache)
+            ea.optimize()
+            self.assertEqual(200, ea._func_evals)  # the budget accounting is unchanged
+        self.assertEqual(target.evaluations, cache.misses)
+        self.assertGreater(cache.hits, 300)
+
+
+if __name__ == '__main__':
+    unittest.main()
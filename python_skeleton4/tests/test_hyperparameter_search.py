@@ -2,8 +2,8 @@ import unittest
 import logging
 import numpy as np
 
-from src.hpo import determine_best_hypers
-from src.evolution import Recombination
+from src.hpo import determine_best_hypers, get_configurations, run_sweep
+from src.evolution import Mutation, ParentSelection, Recombination
 
 
 class TestSimpleHPO(unittest.TestCase):
@@ -33,6 +33,20 @@ class TestSimpleHPO(unittest.TestCase):
         # so we can simply test if it was found to be best more than all other recombination methods combined
         self.assertTrue(inter_count > np.sum(counts))
 
+    def test_sweep(self):
+        """Test the sweep table and that per-task seeding makes it independent of the number of workers"""
+        self.assertEqual(27, len(get_configurations()))
+        configurations = get_configurations(num_random=3, seed=1)
+        self.assertEqual(3, len(configurations))
+        serial = run_sweep(configurations, num_seeds=4, seed=7, max_workers=1)
+        parallel = run_sweep(configurations, num_seeds=4, seed=7, max_workers=2)
+        self.assertListEqual(serial, parallel)
+        self.assertListEqual(sorted(row['mean'] for row in serial), [row['mean'] for row in serial])
+        self.assertTrue(all(row['std'] >= 0 and row['num_seeds'] == 4 for row in serial))
+        self.assertIsInstance(serial[0]['mutation'], Mutation)
+        self.assertIsInstance(serial[0]['selection'], ParentSelection)
+        self.assertNotEqual(serial, run_sweep(configurations, num_seeds=4, seed=8, max_workers=1))
+
 
 
 if __name__ == '__main__':
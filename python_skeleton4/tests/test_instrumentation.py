@@ -0,0 +1,65 @@
+import io
+import json
+import unittest
+import logging
+import numpy as np
+
+from src.evolution import AsyncEA, EA, Member, Mutation, VectorizedEA
+from src.instrumentation import GenerationStatsHandler
+from src.target_function import ackley
+
+
+class TestInstrumentation(unittest.TestCase):
+    """
+    Tests for the logging of the EA
+    """
+
+    def setUp(self):  # This Method is executed once before each test
+        logging.basicConfig(level=logging.DEBUG)
+        np.random.seed(0)
+
+    def test_generation_stats(self):
+        """Test every step emits one structured record"""
+        for engine, phases in [(EA, {'selection', 'variation', 'evaluation', 'survival'}),
+                               (VectorizedEA, {'selection', 'variation', 'evaluation', 'survival'}),
+                               (AsyncEA, {'submission', 'waiting', 'survival'})]:
+            stream = io.StringIO()
+            handler = GenerationStatsHandler(stream)
+            logger = logging.getLogger(engine.__name__)
+            logger.addHandler(handler)
+            logger.setLevel(logging.INFO)
+            try:
+                ea = engine(ackley, 10, 2, total_number_of_function_evaluations=60, children_per_step=5)
+                ea.optimize()
+            finally:
+                logger.removeHandler(handler)
+                logger.setLevel(logging.NOTSET)
+            self.assertEqual(len(ea.trajectory_fitness) - 1, len(handler.records))
+            self.assertListEqual(handler.records, [json.loads(line) for line in stream.getvalue().splitlines()])
+            self.assertEqual(60, handler.records[-1]['func_evals'])
+            self.assertEqual(ea.get_best_fitness(), handler.records[-1]['best_fitness'])
+            for record in handler.records:
+                self.assertTrue(phases.issubset(record))
+                self.assertTrue(all(record[phase] >= 0 for phase in phases))
+                self.assertGreaterEqual(record['wall_time'], sum(record[phase] for phase in phases))
+
+    def test_disabled_logging(self):
+        """Test members share one logger and nothing is logged or collected when the loggers are disabled"""
+        member = Member(np.zeros(2), ackley, [-30, 30], Mutation.GAUSSIAN, -1, sigma=1.)
+        self.assertNotIn('logger', vars(member))
+        self.assertIs(Member.logger, member.mutate().logger)
+        handler = GenerationStatsHandler(level=logging.DEBUG)
+        for name in ['Member', 'EA']:
+            logging.getLogger(name).addHandler(handler)
+            logging.getLogger(name).setLevel(logging.WARNING)
+        try:
+            EA(ackley, 10, 2, mutation_type=Mutation.GAUSSIAN, total_number_of_function_evaluations=60).optimize()
+        finally:
+            for name in ['Member', 'EA']:
+                logging.getLogger(name).removeHandler(handler)
+                logging.getLogger(name).setLevel(logging.NOTSET)
+        self.assertListEqual([], handler.records)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+import logging
+import numpy as np
+
+from src.evolution import EA, Mutation, ParentSelection, VectorizedEA
+from src.island import IslandModel, Topology, migration_sources
+from src.target_function import ackley
+
+
+class TestIslandModel(unittest.TestCase):
+    """
+    Simple tests for the island model
+    """
+
+    def setUp(self):  # This Method is executed once before each test
+        logging.basicConfig(level=logging.DEBUG)
+        np.random.seed(0)
+
+    def test_topology(self):
+        """Test which islands send migrants to which"""
+        self.assertListEqual([[3], [0], [1], [2]], migration_sources(Topology.RING, 4))
+        self.assertListEqual([[1, 2], [0, 2], [0, 1]], migration_sources(Topology.FULLY_CONNECTED, 3))
+        self.assertListEqual([[]], migration_sources(Topology.RING, 1))
+
+    def test_migration(self):
+        """Test migrants are inserted through survival selection and do not count as function evaluations"""
+        for engine in [EA, VectorizedEA]:
+            ea = engine(ackley, 10, 2, total_number_of_function_evaluations=100)
+            x, fitness = ea.emigrants(3)
+            self.assertEqual((3, 2), x.shape)
+            self.assertListEqual(fitness.tolist(), ea.get_fitness_array()[:3].tolist())
+            ea.immigrate(np.zeros((2, 2)), np.array([ackley(np.zeros(2))] * 2))
+            self.assertEqual(10, len(ea.get_fitness_array()))
+            self.assertEqual(10, ea._func_evals)
+            self.assertListEqual([0., 0.], ea.get_best_member().x_coordinate.tolist())
+            self.assertTrue(np.all(np.diff(ea.get_fitness_array()) >= 0))
+
+    def test_processes(self):
+        """Test islands in processes give the same result as in-process islands and the best member spreads"""
+        settings = [dict(population_size=10, problem_dim=2, mutation_type=Mutation.GAUSSIAN),
+                    dict(population_size=10, problem_dim=2, selection_type=ParentSelection.TOURNAMENT)]
+        results = []
+        for processes in [True, False]:
+            islands = IslandModel(ackley, settings, Topology.FULLY_CONNECTED, migration_interval=50,
+                                  total_number_of_function_evaluations=400, processes=processes, seed=1)
+            best = islands.optimize()
+            results.append((best.x_coordinate.tolist(), best.fitness, islands.trajectory_fitness))
+            self.assertEqual(400, islands._func_evals)
+            self.assertEqual(4, len(islands.trajectory_fitness))
+            self.assertTrue(np.all(np.diff(islands.trajectory_fitness) <= 0))
+        self.assertEqual(results[0], results[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
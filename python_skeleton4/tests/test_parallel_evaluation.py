@@ -0,0 +1,65 @@
+import unittest
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from src.evolution import EA, VectorizedEA, Mutation, ParentSelection
+from src.target_function import ackley, batch_target
+
+
+def point_wise_ackley(x):
+    """ackley without batch support (module level so it can be pickled)"""
+    return ackley(x)
+
+
+class TestParallelEvaluation(unittest.TestCase):
+    """
+    Test that evaluating offspring through an executor does not change the optimization
+    """
+
+    def setUp(self):  # This Method is executed once before each test
+        logging.basicConfig(level=logging.DEBUG)
+
+    def run_ea(self, engine, target, executor):
+        np.random.seed(1)
+        ea = engine(target, 10, 3, selection_type=ParentSelection.TOURNAMENT, mutation_type=Mutation.GAUSSIAN,
+                    total_number_of_function_evaluations=200, executor=executor, max_workers=4)
+        best = ea.optimize()
+        return ea, best
+
+    def test_executors_match_serial(self):
+        """Test trajectory and evaluation counts are identical for serial, thread and process evaluation"""
+        for engine in [EA, VectorizedEA]:
+            for target in [ackley, point_wise_ackley]:
+                serial, serial_best = self.run_ea(engine, target, None)
+                for executor in ['thread', 'process']:
+                    ea, best = self.run_ea(engine, target, executor)
+                    self.assertEqual(serial._func_evals, ea._func_evals)
+                    self.assertEqual(serial_best.fitness, best.fitness)
+                    self.assertListEqual([m.fitness for m in serial.trajectory], [m.fitness for m in ea.trajectory])
+                    self.assertIsNone(ea._executor)  # optimize shuts down its own pool
+
+    def test_user_executor(self):
+        """Test a user provided executor is used but not shut down"""
+        with ThreadPoolExecutor(2) as pool:
+            ea, _ = self.run_ea(EA, point_wise_ackley, pool)
+            self.assertIs(pool, ea._executor)
+            self.assertEqual(4, pool.submit(lambda: 4).result())
+
+    def test_batch_chunks_per_worker(self):
+        """Test batch capable targets are split into one chunk per worker, not per CPU"""
+        batch_sizes = []
+
+        @batch_target
+        def sphere(x):
+            batch_sizes.append(len(np.atleast_2d(x)))
+            return np.sum(x ** 2, axis=-1)
+
+        EA(sphere, 10, 2, total_number_of_function_evaluations=30, children_per_step=10, executor='thread',
+           max_workers=2).optimize()
+        self.assertListEqual([5] * 6, batch_sizes)
+
+
+if __name__ == '__main__':
+    unittest.main()
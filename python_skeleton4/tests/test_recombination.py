@@ -3,7 +3,7 @@ import logging
 import numpy as np
 from functools import partial
 
-from src.evolution import Recombination, Member
+from src.evolution import Recombination, Member, recombine_batch
 from src.target_function import ackley
 
 
@@ -44,6 +44,29 @@ class TestRecombinationMechanisms(unittest.TestCase):
         recombine_func = partial(a.recombine, b)
         self.assertRaises(AssertionError, recombine_func)
 
+    def test_n_point_recombination(self):
+        """Test the child switches between the parents exactly at the cut points"""
+        a = Member(np.zeros(10), ackley, [-30, 30], -1, Recombination.N_POINT)
+        b = Member(np.ones(10), ackley, [-30, 30], -1, Recombination.N_POINT)
+        for _ in range(100):
+            child = a.recombine(b).x_coordinate
+            self.assertEqual(0, child[0])  # the first segment always comes from a
+            self.assertEqual(2, np.count_nonzero(np.diff(child)))  # two distinct cut points
+        self.assertListEqual([0.], Member(np.zeros(1), ackley, [-30, 30], -1, Recombination.N_POINT).recombine(
+            Member(np.ones(1), ackley, [-30, 30], -1, Recombination.N_POINT)).x_coordinate.tolist())
+
+    def test_blend_and_sbx_recombination(self):
+        """Test blend and simulated binary crossover spread children around the parents and respect the bounds"""
+        for recombination in [Recombination.BLEND, Recombination.SBX]:
+            a = Member(np.array([-1., 0.]), ackley, [-1, 30], -1, recombination)
+            b = Member(np.array([1., 4.]), ackley, [-1, 30], -1, recombination)
+            children = np.array([a.recombine(b).x_coordinate for _ in range(5_000)])
+            self.assertTrue(np.all(-1 <= children))
+            self.assertTrue(np.allclose([2.], np.mean(children[:, 1]), atol=.2))
+            self.assertTrue(np.any(children[:, 1] > 4) and np.any(children[:, 1] < 0))
+        children = recombine_batch(np.zeros((5_000, 1)), np.ones((5_000, 1)), Recombination.BLEND, alpha=.5)
+        self.assertTrue(np.all((-.5 <= children) & (children <= 1.5)))
+
     def test_intermediate_recombination_1d_ackley(self):
         """Test child is actually in the middle"""
         a = Member(np.array([0]), ackley, [-30, 30], -1, Recombination.INTERMEDIATE)
@@ -1,8 +1,9 @@
+import math
 import unittest
 import logging
 import numpy as np
 
-from src.evolution import ParentSelection, EA, Member
+from src.evolution import ParentSelection, EA, Member, sample_without_replacement, select_parent_ids
 from src.target_function import ackley
 
 
@@ -63,3 +64,46 @@ class TestEvoAlgoPerf(unittest.TestCase):
         # zero-sum-game -> mean is easy to determine
         self.assertAlmostEqual(1_000, np.mean(counts))
 
+    def test_survival_selection(self):
+        """Test the population stays sorted, truncated and the running average is correct"""
+        np.random.seed(0)
+        ea = EA(ackley, 10, 2, selection_type=ParentSelection.NEUTRAL,
+                total_number_of_function_evaluations=500, children_per_step=7)
+        for _ in range(50):
+            average = ea.step()
+            fitness = [m.fitness for m in ea.population]
+            self.assertEqual(10, len(fitness))
+            self.assertListEqual(sorted(fitness), fitness)
+            self.assertAlmostEqual(np.mean(fitness), average)
+        # the exposed population is read-only, the running sum stays exact over long runs
+        self.assertIsInstance(ea.population, tuple)
+        for _ in range(2_000):
+            ea.step()
+        self.assertAlmostEqual(math.fsum(m.fitness for m in ea.population) / 10, ea.get_average_fitness(), places=14)
+        # assigning a population sorts it
+        ea.population = [Member(np.array([30]), ackley, [-30, 30], -1, -1),
+                         Member(np.array([0]), ackley, [-30, 30], -1, -1)]
+        self.assertListEqual([0, 30], [m.x_coordinate[0] for m in ea.population])
+        self.assertAlmostEqual(np.mean([ackley(np.array([0.])), ackley(np.array([30.]))]), ea.get_average_fitness())
+
+    def test_sample_without_replacement(self):
+        """Test the tournament index matrix has distinct entries per row and is uniform"""
+        np.random.seed(0)
+        samples = sample_without_replacement(20_000, 5, 3)
+        self.assertEqual((20_000, 3), samples.shape)
+        self.assertTrue(np.all(np.sort(samples, axis=1)[:, 1:] != np.sort(samples, axis=1)[:, :-1]))
+        uniques, counts = np.unique(samples, return_counts=True)
+        self.assertListEqual([0, 1, 2, 3, 4], uniques.tolist())
+        self.assertTrue(np.allclose(counts / 60_000, .2, atol=.01))
+
+    def test_vectorized_tournament(self):
+        """Test that the winner of each tournament is its fittest contestant"""
+        np.random.seed(0)
+        fitness = np.random.permutation(50).astype(float)
+        parent_ids = select_parent_ids(fitness, ParentSelection.TOURNAMENT, 5_000, tournament_size=50)
+        self.assertTrue(np.all(fitness[parent_ids] == 0))
+        # with binary tournaments the worst member can never win
+        fitness = np.random.permutation(10_000).astype(float)
+        parent_ids = select_parent_ids(fitness, ParentSelection.TOURNAMENT, 5_000, tournament_size=2)
+        self.assertTrue(np.argmax(fitness) not in parent_ids)
+        self.assertLess(np.mean(fitness[parent_ids]), np.mean(fitness))
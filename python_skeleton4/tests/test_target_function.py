@@ -0,0 +1,59 @@
+import unittest
+import numpy as np
+
+from src.evolution import EA, VectorizedEA
+from src.target_function import ackley, batch_target, evaluate_batch, rastrigin, rosenbrock, sphere
+
+
+class TestBatchEvaluation(unittest.TestCase):
+    """
+    Simple tests for the batch evaluation contract of target functions
+    """
+
+    def setUp(self):  # This Method is executed once before each test
+        np.random.seed(0)
+
+    def test_vectorized_ackley(self):
+        """Test batch evaluation of ackley matches point-wise evaluation"""
+        coordinates = np.random.uniform(-30, 30, (100, 5))
+        self.assertTrue(np.allclose(ackley(coordinates), [ackley(c) for c in coordinates]))
+        self.assertAlmostEqual(0., ackley(np.zeros(3)))
+        self.assertTrue(np.isscalar(ackley(np.zeros(3))))
+
+    def test_synthetic_functions(self):
+        """Test the other benchmark functions are batch capable and have their minimum where expected"""
+        coordinates = np.random.uniform(-5, 5, (100, 4))
+        for func, optimum in [(sphere, 0.), (rastrigin, 0.), (rosenbrock, 1.)]:
+            self.assertTrue(np.allclose(func(coordinates), [func(c) for c in coordinates]))
+            self.assertAlmostEqual(0., func(np.full(4, optimum)))
+            self.assertTrue(np.all(func(coordinates) > 0))
+
+    def test_evaluate_batch_fallback(self):
+        """Test that target functions without batch support are called point-wise"""
+        calls = []
+
+        def point_wise(x):
+            calls.append(x)
+            return np.sum(x)
+
+        values = evaluate_batch(point_wise, np.ones((4, 2)))
+        self.assertListEqual([2., 2., 2., 2.], values.tolist())
+        self.assertEqual(4, len(calls))
+
+    def test_one_call_per_generation(self):
+        """Test that EA and VectorizedEA send all children of a generation in one call"""
+        for engine in [EA, VectorizedEA]:
+            batch_sizes = []
+
+            @batch_target
+            def sphere(x):
+                batch_sizes.append(len(np.atleast_2d(x)))
+                return np.sum(x ** 2, axis=-1)
+
+            ea = engine(sphere, 10, 2, total_number_of_function_evaluations=40, children_per_step=5)
+            ea.optimize()
+            self.assertListEqual([10, 5, 5, 5, 5, 5, 5], batch_sizes)
+
+
+if __name__ == '__main__':
+    unittest.main()
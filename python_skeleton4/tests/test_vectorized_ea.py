@@ -0,0 +1,82 @@
+import unittest
+import logging
+import numpy as np
+
+from src.evolution import Mutation, Recombination, ParentSelection, Member, VectorizedEA, mutate_batch, \
+    recombine_batch
+from src.target_function import ackley
+
+
+class TestVectorizedEA(unittest.TestCase):
+    """
+    Simple tests for the array based population engine
+    """
+
+    def setUp(self):  # This Method is executed once before each test
+        logging.basicConfig(level=logging.DEBUG)
+        np.random.seed(0)
+
+    def test_mutate_batch_gauss(self):
+        """Test batched gaussian mutation keeps mean, scales with sigma and respects the borders"""
+        parents = np.tile([10., -5.], (10_000, 1))
+        offspring = mutate_batch(parents, Mutation.GAUSSIAN, [-30, 30], sigma=6)
+        self.assertTrue(np.allclose([10., -5.], np.mean(offspring, axis=0), rtol=.1, atol=.3))
+        self.assertTrue(np.allclose([6., 6.], np.std(offspring, axis=0), rtol=.1, atol=.3))
+        offspring = mutate_batch(-np.ones((1_000, 2)), Mutation.GAUSSIAN, [-1, 1], sigma=1)
+        self.assertTrue(np.all((-1 <= offspring) & (offspring <= 1)))
+
+    def test_recombine_batch_uniform(self):
+        """Test batched uniform crossover produces the 4 possible children equally likely"""
+        a = np.zeros((1_000, 2))
+        b = np.ones((1_000, 2))
+        unique_entries, counts = np.unique(recombine_batch(a, b, Recombination.UNIFORM, .5), axis=0,
+                                           return_counts=True)
+        self.assertEqual(len(unique_entries), 4)
+        self.assertTrue(np.allclose([250, 250, 250, 250], counts, atol=50))
+
+    def test_recombine_batch_n_point(self):
+        """Test batched n-point crossover produces alternating segments with one cut per point"""
+        children = recombine_batch(np.zeros((1_000, 20)), np.ones((1_000, 20)), Recombination.N_POINT, num_points=3)
+        self.assertTrue(np.all(children[:, 0] == 0))
+        self.assertTrue(np.all(np.count_nonzero(np.diff(children, axis=1), axis=1) == 3))
+        # every gene but the first is the first gene of a segment for some child
+        self.assertTrue(np.all(np.any(np.diff(children, axis=1) != 0, axis=0)))
+
+    def test_population_layout(self):
+        """Test the population is stored as sorted arrays and stays within the bounds"""
+        ea = VectorizedEA(ackley, 50, 3, selection_type=ParentSelection.TOURNAMENT, mutation_type=Mutation.GAUSSIAN,
+                          total_number_of_function_evaluations=1_000, children_per_step=20)
+        ea.optimize()
+        self.assertEqual((50, 3), ea.population_x.shape)
+        self.assertEqual((50,), ea.population_fitness.shape)
+        self.assertTrue(np.all(np.diff(ea.population_fitness) >= 0))
+        self.assertTrue(np.all((-30 <= ea.population_x) & (ea.population_x <= 30)))
+        self.assertTrue(np.allclose(ea.population_fitness, [ackley(x) for x in ea.population_x]))
+        # like EA, the last step may overshoot the budget by less than children_per_step evaluations
+        self.assertTrue(1_000 <= ea._func_evals < 1_020)
+
+    def test_performance_improves(self):
+        """Test the vectorized engine actually optimizes"""
+        for selection in ParentSelection:
+            ea = VectorizedEA(ackley, 20, 2, selection_type=selection, problem_bounds=[-10, 10],
+                              total_number_of_function_evaluations=1_000)
+            initial = ea.get_average_fitness()
+            best = ea.optimize()
+            self.assertLess(ea.get_average_fitness(), initial)
+            self.assertEqual(best.fitness, ea.population_fitness[0])
+
+    def test_population_setter_and_trajectory(self):
+        """Test members can be assigned like for EA and the trajectory is stored as arrays"""
+        ea = VectorizedEA(ackley, 2, 1, total_number_of_function_evaluations=20, children_per_step=2)
+        ea.population = [Member(np.array([30]), ackley, [-30, 30], -1, -1),
+                         Member(np.array([0]), ackley, [-30, 30], -1, -1)]
+        self.assertListEqual([[0.], [30.]], ea.population_x.tolist())
+        self.assertAlmostEqual(ackley(np.array([0.])), ea.get_best_fitness())
+        ea.optimize()
+        self.assertEqual((10, 1), ea.trajectory_x.shape)
+        self.assertTrue(np.all(np.diff(ea.trajectory_fitness) <= 0))
+        self.assertListEqual(ea.trajectory_fitness.tolist(), [m.fitness for m in ea.trajectory])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,160 @@
+from typing import Union
+
+import numpy as np
+
+
+def stationary(kernel: callable) -> callable:
+    """
+    Decorator to mark stationary kernels, k(x, x) = sigma_f^2 for every x. Their diagonal is known without evaluating
+    the kernel (see kernel_diag)
+    :param kernel: kernel function
+    :return: the same function, marked as stationary
+    """
+    kernel.stationary = True
+    return kernel
+
+
+def _as_matrix(x: np.ndarray) -> np.ndarray:
+    """One point per row, 1-d inputs are treated as n points of dimension 1"""
+    x = np.asarray(x, dtype=float)
+    return x.reshape(-1, 1) if x.ndim < 2 else x
+
+
+def sq_distances(x_1: np.ndarray, x_2: np.ndarray, l: Union[float, np.ndarray] = 1.) -> np.ndarray:
+    """
+    Pairwise squared distances of the (length-scale normalized) inputs, ||x_1||^2 + ||x_2||^2 - 2 x_1 x_2^T, i.e. one
+    matrix product instead of a (n_1, n_2, d) difference array
+    :param x_1: (n_1, d) array (or (n_1, ) for d = 1)
+    :param x_2: (n_2, d) array (or (n_2, ) for d = 1)
+    :param l: length scale, a scalar or one per dimension (ARD)
+    :return: (n_1, n_2) array of squared distances
+    """
+    x_1 = _as_matrix(x_1) / l
+    x_2 = _as_matrix(x_2) / l
+    sq_dist = np.sum(x_1 ** 2, axis=1)[:, None] + np.sum(x_2 ** 2, axis=1)[None, :] - 2 * x_1 @ x_2.T
+    return np.maximum(sq_dist, 0.)  # rounding errors can make the distance of (almost) identical points negative
+
+
+@stationary
+def kernel_se(x_1, x_2, l, sigma_f):
+    """
+    Squared exponential kernel, sigma_f^2 exp(-|x_1 - x_2|^2 / (2 l^2))
+
+    :param x_1: (n_1, d) array (or (n_1, ) for d = 1)
+    :param x_2: (n_2, d) array (or (n_2, ) for d = 1)
+    :param l: length scale. An array with one length scale per dimension gives the RBF kernel with automatic
+              relevance determination (ARD)
+    :param sigma_f: signal standard deviation
+    :return: (n_1, n_2) kernel matrix
+    """
+    return sigma_f ** 2 * np.exp(-sq_distances(x_1, x_2, l) / 2)
+
+
+kernel_rbf_ard = kernel_se  # the squared exponential kernel with one length scale per dimension
+
+
+@stationary
+def kernel_matern32(x_1, x_2, l, sigma_f):
+    """
+    Matern kernel with nu = 3/2, sigma_f^2 (1 + sqrt(3) r) exp(-sqrt(3) r) with r = |x_1 - x_2| / l
+
+    :param x_1: (n_1, d) array (or (n_1, ) for d = 1)
+    :param x_2: (n_2, d) array (or (n_2, ) for d = 1)
+    :param l: length scale, a scalar or one per dimension (ARD)
+    :param sigma_f: signal standard deviation
+    :return: (n_1, n_2) kernel matrix
+    """
+    r = np.sqrt(3 * sq_distances(x_1, x_2, l))
+    return sigma_f ** 2 * (1 + r) * np.exp(-r)
+
+
+@stationary
+def kernel_matern52(x_1, x_2, l, sigma_f):
+    """
+    Matern kernel with nu = 5/2, sigma_f^2 (1 + sqrt(5) r + 5/3 r^2) exp(-sqrt(5) r) with r = |x_1 - x_2| / l
+
+    :param x_1: (n_1, d) array (or (n_1, ) for d = 1)
+    :param x_2: (n_2, d) array (or (n_2, ) for d = 1)
+    :param l: length scale, a scalar or one per dimension (ARD)
+    :param sigma_f: signal standard deviation
+    :return: (n_1, n_2) kernel matrix
+    """
+    sq_dist = 5 * sq_distances(x_1, x_2, l)
+    r = np.sqrt(sq_dist)
+    return sigma_f ** 2 * (1 + r + sq_dist / 3) * np.exp(-r)
+
+
+def kernel_diag(kernel: callable, x: np.ndarray, l, sigma_f) -> np.ndarray:
+    """
+    Diagonal k(x_i, x_i) of the kernel matrix of x without building the matrix
+    :param kernel: kernel function
+    :param x: (n, d) array (or (n, ) for d = 1)
+    :param l: length scale
+    :param sigma_f: signal standard deviation
+    :return: (n, ) array
+    """
+    x = _as_matrix(x)
+    if getattr(kernel, 'stationary', False):
+        return np.full(len(x), float(sigma_f) ** 2)
+    return np.array([kernel(x_i[None], x_i[None], l, sigma_f)[0, 0] for x_i in x])
+
+
+def _se_grad_l(x_1, x_2, l, sigma_f):
+    sq_dist = sq_distances(x_1, x_2, l)
+    return sigma_f ** 2 * np.exp(-sq_dist / 2) * sq_dist / l
+
+
+def _matern32_grad_l(x_1, x_2, l, sigma_f):
+    sq_dist = 3 * sq_distances(x_1, x_2, l)
+    return sigma_f ** 2 * sq_dist * np.exp(-np.sqrt(sq_dist)) / l
+
+
+def _matern52_grad_l(x_1, x_2, l, sigma_f):
+    sq_dist = 5 * sq_distances(x_1, x_2, l)
+    r = np.sqrt(sq_dist)
+    return sigma_f ** 2 * sq_dist * (1 + r) * np.exp(-r) / (3 * l)
+
+
+# kernel -> derivative of the kernel matrix with respect to a scalar length scale
+_LENGTH_SCALE_GRADIENTS = {kernel_se: _se_grad_l, kernel_matern32: _matern32_grad_l,
+                           kernel_matern52: _matern52_grad_l}
+
+
+def kernel_grad_l(kernel: callable, x_1: np.ndarray, x_2: np.ndarray, l: float, sigma_f: float) -> np.ndarray:
+    """
+    Derivative of the kernel matrix with respect to the (scalar) length scale, e.g. for the gradient of the negative
+    log likelihood. The derivative with respect to sigma_f is 2 k / sigma_f for every kernel in this module
+    :param kernel: one of the kernels of this module
+    :param x_1: (n_1, d) array (or (n_1, ) for d = 1)
+    :param x_2: (n_2, d) array (or (n_2, ) for d = 1)
+    :param l: length scale
+    :param sigma_f: signal standard deviation
+    :return: (n_1, n_2) array
+    """
+    if kernel not in _LENGTH_SCALE_GRADIENTS:
+        raise NotImplementedError
+    return _LENGTH_SCALE_GRADIENTS[kernel](x_1, x_2, l, sigma_f)
+
+
+# kernel -> kernel of sigma_f = 1 as function of the squared length-scale normalized distance, see kernel_stack
+_PROFILES = {kernel_se: lambda sq_dist: np.exp(-sq_dist / 2),
+             kernel_matern32: lambda sq_dist: (1 + np.sqrt(3 * sq_dist)) * np.exp(-np.sqrt(3 * sq_dist)),
+             kernel_matern52: lambda sq_dist: (1 + np.sqrt(5 * sq_dist) + 5 / 3 * sq_dist) *
+             np.exp(-np.sqrt(5 * sq_dist))}
+
+
+def kernel_stack(kernel: callable, x: np.ndarray, l: np.ndarray, sigma_f: np.ndarray) -> np.ndarray:
+    """
+    Kernel matrices of x for a batch of (scalar) hyperparameters. The distances are computed once for the whole
+    batch for the kernels of this module, other kernels are evaluated once per hyperparameter setting
+    :param kernel: kernel function
+    :param x: (n, d) array (or (n, ) for d = 1)
+    :param l: (b, ) array of length scales
+    :param sigma_f: (b, ) array of signal standard deviations
+    :return: (b, n, n) array
+    """
+    l, sigma_f = np.broadcast_arrays(np.ravel(l).astype(float), np.ravel(sigma_f).astype(float))
+    if kernel not in _PROFILES:
+        return np.stack([kernel(x, x, l_i, sigma_f_i) for l_i, sigma_f_i in zip(l, sigma_f)])
+    sq_dist = sq_distances(x, x)
+    return sigma_f[:, None, None] ** 2 * _PROFILES[kernel](sq_dist[None] / l[:, None, None] ** 2)
@@ -1,10 +1,18 @@
 import operator
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Tuple
 
 import matplotlib.pyplot as plt
 import numpy as np
 from matplotlib import rcParams
+from scipy.linalg import cho_solve, solve_triangular
 from scipy.optimize import minimize
 
+try:
+    from src.kernels import kernel_diag, kernel_grad_l, kernel_se, kernel_stack
+except ModuleNotFoundError:  # executed as a script from within src
+    from kernels import kernel_diag, kernel_grad_l, kernel_se, kernel_stack
+
 rcParams.update({'figure.autolayout': True})
 plt.style.use('seaborn-whitegrid')
 
@@ -23,24 +31,11 @@ def phi_n_of_x(n: int) -> np.ndarray:
     return phi_of_x
 
 
-def kernel_se(x_1, x_2, l, sigma_f):
-    """
-    Squared exponential kernel
-
-    :param x_1:
-    :param x_2:
-    :param l: length scale
-    :param sigma_f:
-    :return:
-    """
-    sq_dist = np.array([-(x - x_2)**2 for x in x_1]).reshape(x_1.shape[0], x_2.shape[0])
-    return np.exp(sq_dist / (2*l**2))
-
-
 def gp_prediction_a(data: np.ndarray, X: np.ndarray, phi: callable, sigma_n: float, Sigma_p: np.ndarray) \
         -> (np.ndarray, np.ndarray):
     """
-    Implementation of 2.11
+    Implementation of 2.11 (weight space view). A is factorized once for all test points, the cost is
+    O(D^3 + D^2 (N + M)) for D features, N data points and M test points
     :param data: Data on which the model is fit
     :param X: Data to predict the mean and variance
     :param phi: basis functions
@@ -48,28 +43,23 @@ def gp_prediction_a(data: np.ndarray, X: np.ndarray, phi: callable, sigma_n: flo
     :param Sigma_p: covariance
     :return: mean and variance for all points in X
     """
-    # TODO compute parts
     phi_X = phi(data[:, 0])
+    phi_star = phi(np.asarray(X, dtype=float))
     A = np.matmul(phi_X, phi_X.transpose()) / sigma_n + np.linalg.inv(Sigma_p)
-
-    # for storing the results
-    means = []
-    variances = []
-    # loop over all X
-    for xs in X:
-        # TODO compute mean and variance
-        phi_x_A_inv = np.matmul(phi(xs), np.linalg.inv(A))
-        means.append(
-            np.matmul(phi_x_A_inv, np.matmul(phi_X, data[:, 1]))/sigma_n)
-        variances.append(np.matmul(phi_x_A_inv, phi(xs)))
-
-    return np.array(means).reshape(-1), np.array(variances).reshape(-1)
+    # one LU factorization of A for the mean (first column) and all test points. Polynomial features are far too
+    # ill-conditioned for a Cholesky factorization
+    rhs = np.column_stack([np.matmul(phi_X, data[:, 1]) / sigma_n, phi_star])
+    A_inv_rhs = np.linalg.solve(A, rhs)
+    means = np.matmul(phi_star.transpose(), A_inv_rhs[:, 0])
+    variances = np.sum(phi_star * A_inv_rhs[:, 1:], axis=0)
+    return means.reshape(-1), variances.reshape(-1)
 
 
 def gp_prediction_b(data: np.ndarray, X: np.ndarray, phi: callable, sigma_n: float, Sigma_p: np.ndarray) \
         -> (np.ndarray, np.ndarray):
     """
-    Implementation of 2.12
+    Implementation of 2.12 (function space view). K = phi_X^T Sigma_p phi_X + sigma_n I is factorized once for all
+    test points, the cost is O(N^3 + D^2 (N + M) + N^2 M) for D features, N data points and M test points
     :param data: Data on which the model is fit
     :param X: Data to predict the mean and variance
     :param phi: basis functions
@@ -77,89 +67,261 @@ def gp_prediction_b(data: np.ndarray, X: np.ndarray, phi: callable, sigma_n: flo
     :param Sigma_p: covariance
     :return: mean and variance for all points in X
     """
-    # TODO compute parts
     phi_X = phi(data[:, 0])
+    phi_star = phi(np.asarray(X, dtype=float))
     sigma_phi_X = np.matmul(Sigma_p, phi_X)
-    sigma_n_diag = np.diag([sigma_n for _ in range(data.shape[0])])
-    # for storing the results
-    means = []
-    variances = []
-    # loop over all X
-    for xs in X:
-        # TODO compute mean and variance
-        phi_sigma_phi = np.matmul(phi(xs).reshape(1, -1), sigma_phi_X)
-        phi_X_sigma_phi = np.matmul(phi_X.transpose(), sigma_phi_X)
-        inverse = np.linalg.inv(phi_X_sigma_phi + sigma_n_diag)
-        means.append(np.matmul(np.matmul(phi_sigma_phi, inverse), data[:, 1]))
-
-        phi_SIGMA_phi = np.matmul(phi(xs), np.matmul(Sigma_p, phi(xs)))
-        variances.append(phi_SIGMA_phi - np.matmul(
-            np.matmul(np.matmul(phi(xs), sigma_phi_X),
-                      inverse).reshape(1, -1),
-            np.matmul(phi_X.transpose(), np.matmul(Sigma_p, phi(xs)).reshape(-1,1))))
-
-    return np.array(means).reshape(-1), np.array(variances).reshape(-1)
-
-
-def gp_prediction_b_kernel(data: np.ndarray, X: np.ndarray, l: float, sigma_n: float, sigma_f: float) \
+    sigma_phi_star = np.matmul(Sigma_p, phi_star)
+    K = np.matmul(phi_X.transpose(), sigma_phi_X) + sigma_n * np.eye(data.shape[0])
+    K_star = np.matmul(phi_X.transpose(), sigma_phi_star)  # (N, M)
+    # one LU factorization of K for the mean (first column) and all test points
+    K_inv_rhs = np.linalg.solve(K, np.column_stack([data[:, 1], K_star]))
+    means = np.matmul(K_star.transpose(), K_inv_rhs[:, 0])
+    variances = np.sum(phi_star * sigma_phi_star, axis=0) - np.sum(K_star * K_inv_rhs[:, 1:], axis=0)
+    return means.reshape(-1), variances.reshape(-1)
+
+
+def gp_prediction(data: np.ndarray, X: np.ndarray, phi: callable, sigma_n: float, Sigma_p: np.ndarray) \
         -> (np.ndarray, np.ndarray):
     """
+    Bayesian linear regression with the cheaper of the two equivalent implementations: 2.11 factorizes a D x D and
+    2.12 a N x N matrix, so 2.11 is used if there are at most as many features D as data points N
+    :param data: Data on which the model is fit
+    :param X: Data to predict the mean and variance
+    :param phi: basis functions
+    :param sigma_n: variance for points in data
+    :param Sigma_p: covariance
+    :return: mean and variance for all points in X
+    """
+    if len(Sigma_p) <= data.shape[0]:
+        return gp_prediction_a(data, X, phi, sigma_n, Sigma_p)
+    return gp_prediction_b(data, X, phi, sigma_n, Sigma_p)
+
+
+class GPPredictor:
+    """
+    GP posterior for repeated predictions, squared exponential kernel by default (see src.kernels for others).
+    K_y is factorized once (Cholesky) and alpha = K_y^-1 y is cached, every prediction then only needs the train-test
+    kernel matrix. Predictions are made in batches of test points and only the diagonal of the posterior covariance
+    is computed, i.e. memory is O(n_train * batch_size) no matter how many test points there are.
+    """
+
+    def __init__(self, X_train: np.ndarray, Y_train: np.ndarray, l: float, sigma_n: float, sigma_f: float,
+                 kernel: callable = kernel_se) -> None:
+        """
+        Init
+        :param X_train: training inputs, (n, d) array (or (n, ) for d = 1)
+        :param Y_train: training targets
+        :param l: length-scale
+        :param sigma_n: variance for points in data
+        :param sigma_f: signal standard deviation
+        :param kernel: kernel function k(x_1, x_2, l, sigma_f)
+        """
+        self.X_train = self._as_matrix(X_train)
+        self.l, self.sigma_n, self.sigma_f = l, sigma_n, sigma_f
+        self.kernel = kernel
+        K_y = kernel(self.X_train, self.X_train, l, sigma_f) + sigma_n ** 2 * np.eye(len(self.X_train))
+        self.L = np.linalg.cholesky(K_y)
+        self.alpha = cho_solve((self.L, True), np.asarray(Y_train, dtype=float).reshape(-1))
+
+    @staticmethod
+    def _as_matrix(X: np.ndarray) -> np.ndarray:
+        X = np.asarray(X, dtype=float)
+        return X.reshape(-1, 1) if X.ndim < 2 else X
+
+    def predict(self, X: np.ndarray, batch_size: int = 4096) -> (np.ndarray, np.ndarray):
+        """
+        Posterior mean and variance
+        :param X: Data to predict the mean and variance
+        :param batch_size: number of test points per batch
+        :return: mean and variance for all points in X
+        """
+        X = self._as_matrix(X)
+        means = np.empty(len(X))
+        variances = np.empty(len(X))
+        for start in range(0, len(X), batch_size):
+            X_batch = X[start:start + batch_size]
+            K_star = self.kernel(self.X_train, X_batch, self.l, self.sigma_f)
+            means[start:start + batch_size] = K_star.T @ self.alpha
+            v = solve_triangular(self.L, K_star, lower=True)
+            # only the diagonal of K_starstar is needed, which kernel_diag gets without building the matrix
+            variances[start:start + batch_size] = kernel_diag(self.kernel, X_batch, self.l, self.sigma_f) - \
+                np.sum(v ** 2, axis=0)
+        return means, variances
+
+
+def gp_prediction_b_kernel(data: np.ndarray, X: np.ndarray, l: float, sigma_n: float, sigma_f: float,
+                           kernel: callable = kernel_se) -> (np.ndarray, np.ndarray):
+    """
     Implementation of 2.12 in a kernelized way
     :param data: Data on which the model is fit
     :param X: Data to predict the mean and variance
     :param l: length-scale
     :param sigma_n: variance for points in data
-    :param sigma_f:
+    :param sigma_f: signal standard deviation
+    :param kernel: kernel function k(x_1, x_2, l, sigma_f), e.g. one of src.kernels
     :return:
     """
     X_train=np.array(list(map(operator.itemgetter(0), data))).reshape(-1, 1)
     Y_train=np.array(list(map(operator.itemgetter(1), data)))
-
-    X=X.reshape(-1, 1)
     # For Exercise c
-    K_f=kernel_se(X_train, X_train, l, sigma_f)
-    K_y=K_f + sigma_n ** 2 * np.eye(len(X_train))
-    K_star=kernel_se(X_train, X, l, sigma_f)
-    K_starstar=kernel_se(X, X, l, sigma_f) + 1e-8 * np.eye(len(X))
-    K_y_inv=np.linalg.inv(K_y)
-
-    cov_s=K_starstar - np.dot(np.dot(np.transpose(K_star), K_y_inv), K_star)
-    mu_s=np.dot(np.transpose(K_star), np.dot(K_y_inv, Y_train))
+    return GPPredictor(X_train, Y_train, l, sigma_n, sigma_f, kernel).predict(X)
 
-    cov_s=np.diag(cov_s)
-    return mu_s, cov_s
 
-
-def negative_log_likelihood(data: np.ndarray):
+def negative_log_likelihood(data: np.ndarray, kernel: callable = kernel_se, gradient: bool = False,
+                            log_space: bool = False):
     """
-    Implementation of the *negative* log likelihood as a factory method
+    Implementation of the *negative* log likelihood as a factory method.
+    Every call factorizes K_y once, the Cholesky factor gives the data fit term, the log determinant and the gradient
     :param data: Data on which the model is fit
+    :param kernel: kernel function k(x_1, x_2, l, sigma_f), e.g. one of src.kernels
+    :param gradient: the returned function also returns the analytic gradient (use with minimize(..., jac=True))
+    :param log_space: the returned function expects (log l, log sigma_f, log sigma_n), the gradient is with respect
+                      to them as well. Removes the positivity constraints of the optimization
     :return:
     """
     X_train=np.array(list(map(operator.itemgetter(0), data))).reshape(-1, 1)
-    Y_train=np.array(list(map(operator.itemgetter(1), data))).reshape(-1, 1)
+    Y_train=np.array(list(map(operator.itemgetter(1), data)), dtype=float).reshape(-1)
+    eye = np.eye(len(X_train))
 
     def nll(theta):
         """
         The actual negative log likelihood function
         :param theta: a list or tuple containing the GP parameters to be optimized.
-        :return:
+        :return: the negative log likelihood and, if gradient is set, its gradient with respect to theta
         """
+        theta = np.exp(theta) if log_space else np.asarray(theta, dtype=float)
         l, sigma_f, sigma_n=theta
-        
-        K_y = kernel_se(X_train, X_train, l, sigma_f) + sigma_n ** 2 * np.eye(len(X_train))
-        term_1 = - np.matmul(Y_train.transpose(), np.matmul(np.linalg.inv(K_y), Y_train))
+
+        K_f = kernel(X_train, X_train, l, sigma_f)
+        L = np.linalg.cholesky(K_f + sigma_n ** 2 * eye)
+        alpha = cho_solve((L, True), Y_train)
+        term_1 = 0.5 * Y_train @ alpha
 
         # You are given term 2 and 3
-        L=np.linalg.cholesky(K_y)
         term_2=np.sum(np.log(np.diag(L)))
 
         term_3=0.5 * len(X_train) * np.log(2 * np.pi)
-        return term_1 + term_2 + term_3
+        value = term_1 + term_2 + term_3
+        if not gradient:
+            return value
+
+        # d nll / d theta_i = 0.5 tr((K_y^-1 - alpha alpha^T) d K_y / d theta_i), all matrices are symmetric
+        W = cho_solve((L, True), eye) - np.outer(alpha, alpha)
+        grad = 0.5 * np.array([np.sum(W * kernel_grad_l(kernel, X_train, X_train, l, sigma_f)),
+                               np.sum(W * K_f) * 2 / sigma_f,
+                               np.trace(W) * 2 * sigma_n])
+        if log_space:
+            grad *= theta  # chain rule, d theta / d log theta = theta
+        return value, grad
+
+    return nll
+
+
+def _fit_from_start(task: Tuple) -> Optional[object]:
+    """One start of fit_hyperparameters. Module level so it can be sent to worker processes"""
+    data, start, kernel, bounds = task
+    log_bounds = [tuple(None if b is None else np.log(b) for b in bound) for bound in bounds]
+    try:
+        res = minimize(negative_log_likelihood(data, kernel, gradient=True, log_space=True), np.log(start),
+                       jac=True, bounds=log_bounds, method='L-BFGS-B')
+    except np.linalg.LinAlgError:  # K_y numerically not positive definite somewhere on the way
+        return None
+    res.x = np.exp(res.x)
+    return res
 
+
+def fit_hyperparameters(data: np.ndarray, x0: Optional[np.ndarray] = None, num_starts: int = 8,
+                        kernel: callable = kernel_se, bounds=((1e-5, None), (1e-5, None), (1e-5, None)),
+                        init_range: Tuple[float, float] = (1e-2, 1e1), seed: Optional[int] = None,
+                        max_workers: Optional[int] = None):
+    """
+    Multi-start maximum likelihood estimation of (l, sigma_f, sigma_n). Every start is an L-BFGS-B run in log-space
+    with analytic gradients, the starts run in parallel
+    :param data: Data on which the model is fit
+    :param x0: optional first start, e.g. the current hyperparameters
+    :param num_starts: number of starts, the others are drawn log-uniformly from init_range
+    :param kernel: kernel function, one of src.kernels
+    :param bounds: (lower, upper) bounds of l, sigma_f and sigma_n, None for no bound
+    :param init_range: range of the random starts
+    :param seed: seed for drawing the starts
+    :param max_workers: number of worker processes. 1 runs everything in this process, None uses all CPUs
+    :return: scipy OptimizeResult of the best start, x are the hyperparameters (not their logarithm)
+    """
+    assert num_starts > 0
+    starts = np.exp(np.random.RandomState(seed).uniform(*np.log(init_range), size=(num_starts, 3)))
+    if x0 is not None:
+        starts[0] = x0
+    tasks = [(data, start, kernel, bounds) for start in starts]
+    if max_workers == 1:
+        results = list(map(_fit_from_start, tasks))
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            results = list(pool.map(_fit_from_start, tasks))
+    results = [res for res in results if res is not None]
+    if not results:
+        raise np.linalg.LinAlgError('K_y is not positive definite for any start')
+    return min(results, key=lambda res: res.fun)
+
+
+def _batched_cholesky(K: np.ndarray) -> np.ndarray:
+    """
+    Cholesky factors of a stack of matrices. np.linalg.cholesky fails for the whole stack if a single matrix is not
+    positive definite, in that case the stack is bisected until the failing matrices are found. Their factors are NaN
+    """
+    try:
+        return np.linalg.cholesky(K)
+    except np.linalg.LinAlgError:
+        if len(K) == 1:
+            return np.full_like(K, np.nan)
+        half = len(K) // 2
+        return np.concatenate([_batched_cholesky(K[:half]), _batched_cholesky(K[half:])])
+
+
+def _nll_chunk(task: Tuple) -> np.ndarray:
+    """Negative log likelihood of a chunk of hyperparameter settings. Module level so it can be sent to worker
+    processes"""
+    X_train, Y_train, theta, kernel = task
+    l, sigma_f, sigma_n = theta.T
+    K_y = kernel_stack(kernel, X_train, l, sigma_f) + sigma_n[:, None, None] ** 2 * np.eye(len(X_train))
+    L = _batched_cholesky(K_y)
+    valid = ~np.isnan(L[:, 0, 0])
+    nll = np.full(len(theta), np.nan)
+    # L z = y gives the data fit term y^T K_y^-1 y = z^T z
+    z = np.linalg.solve(L[valid], np.broadcast_to(Y_train[:, None], (np.sum(valid), len(Y_train), 1)))[..., 0]
+    nll[valid] = 0.5 * np.sum(z ** 2, axis=1) + np.sum(np.log(np.diagonal(L[valid], axis1=1, axis2=2)), axis=1) + \
+        0.5 * len(X_train) * np.log(2 * np.pi)
     return nll
 
 
+def nll_landscape(data: np.ndarray, l: np.ndarray, sigma_f: np.ndarray, sigma_n: np.ndarray,
+                  kernel: callable = kernel_se, chunk_size: int = 512, max_workers: Optional[int] = 1) -> np.ndarray:
+    """
+    Negative log likelihood on a whole grid of hyperparameters, e.g. for plotting its landscape. The kernel matrices
+    of a chunk of grid cells are built and factorized as one stack
+    :param data: Data on which the model is fit
+    :param l: length scales, e.g. from np.meshgrid. l, sigma_f and sigma_n are broadcast against each other
+    :param sigma_f: signal standard deviations
+    :param sigma_n: noise standard deviations
+    :param kernel: kernel function k(x_1, x_2, l, sigma_f), e.g. one of src.kernels
+    :param chunk_size: number of grid cells per stack, bounds the memory to chunk_size * N^2 floats
+    :param max_workers: number of worker processes for the chunks. 1 runs everything in this process, None uses all
+                        CPUs
+    :return: array of the broadcast shape of l, sigma_f and sigma_n, NaN where K_y is not positive definite
+    """
+    assert chunk_size > 0
+    X_train=np.array(list(map(operator.itemgetter(0), data))).reshape(-1, 1)
+    Y_train=np.array(list(map(operator.itemgetter(1), data)), dtype=float).reshape(-1)
+    l, sigma_f, sigma_n = np.broadcast_arrays(l, sigma_f, sigma_n)
+    theta = np.column_stack([l.ravel(), sigma_f.ravel(), sigma_n.ravel()]).astype(float)
+    tasks = [(X_train, Y_train, theta[start:start + chunk_size], kernel) for start in range(0, len(theta), chunk_size)]
+    if max_workers == 1:
+        results = list(map(_nll_chunk, tasks))
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            results = list(pool.map(_nll_chunk, tasks))
+    return np.concatenate(results).reshape(l.shape)
+
+
 def main():
     # ################################################### Data to use ######################################################
     train_data=np.array([(np.array(x), np.sin(x) + 0.1 * np.cos(10 * x))
@@ -255,8 +417,8 @@ def main():
     intermediate_xs=[np.array([l_init, sigma_f_init, sigma_n_init])]
     callback_recorder=lambda x: intermediate_xs.append(np.array(x))
 
-    res=minimize(negative_log_likelihood(train_data), [l_init, sigma_f_init, sigma_n_init],
-                   bounds=((1e-5, None), (1e-5, None), (1e-5, None)), method='L-BFGS-B', 
+    res=minimize(negative_log_likelihood(train_data, gradient=True), [l_init, sigma_f_init, sigma_n_init], jac=True,
+                   bounds=((1e-5, None), (1e-5, None), (1e-5, None)), method='L-BFGS-B',
                    callback=callback_recorder)
     trajectory=np.array(intermediate_xs)
     l_opt, sigma_f_opt, sigma_n_opt=res.x
@@ -269,7 +431,7 @@ def main():
     plt.title('GP Hyperparameter Optimization')
     plt.subplot(2, 1, 1)
     plt.title(
-        'INIT NLL: {:.3f}, l: {:.3f}, sigma_n: {:.3f}, sigma_f: {:.3f}'.format(nll_init[0], l_init, sigma_n_init,
+        'INIT NLL: {:.3f}, l: {:.3f}, sigma_n: {:.3f}, sigma_f: {:.3f}'.format(nll_init, l_init, sigma_n_init,
                                                                                sigma_f_init))
     plt.fill_between(X, m_init - 2 * np.sqrt(v_init), m_init + \
                      2 * np.sqrt(v_init), alpha=0.2, color='g')
@@ -282,7 +444,7 @@ def main():
 
     plt.subplot(2, 1, 2)
     plt.title(
-        'OPT: NLL: {:.3f}, l: {:.3f}, sigma_n: {:.3f}, sigma_f: {:.3f}'.format(nll_opt[0], l_opt, sigma_n_opt,
+        'OPT: NLL: {:.3f}, l: {:.3f}, sigma_n: {:.3f}, sigma_f: {:.3f}'.format(nll_opt, l_opt, sigma_n_opt,
                                                                                sigma_f_opt))
     plt.fill_between(X, m_opt - 2 * np.sqrt(v_opt), m_opt + \
                      2 * np.sqrt(v_opt), alpha=0.2, color='g')
@@ -300,15 +462,7 @@ def main():
     l_grid=np.logspace(-2, 1, l_res)
     sigma_f_grid=np.logspace(-1, 1.0, sigma_f_res)
     l, sigma_f=np.meshgrid(l_grid, sigma_f_grid)
-    nll_grid=np.zeros((l_res, sigma_f_res))
-    nll=negative_log_likelihood(train_data)
-    for i in range(l_res):
-        for j in range(sigma_f_res):
-            try:
-                nll_grid[i, j]=- nll([l[i, j], sigma_f[i, j], sigma_n_opt])
-            except np.linalg.LinAlgError as e:
-                print(e)
-                nll_grid[i, j]=np.nan
+    nll_grid=- nll_landscape(train_data, l, sigma_f, sigma_n_opt)
     plt.contour(l, sigma_f, nll_grid, 1000, cmap="RdBu_r", zorder=1)
     cbar=plt.colorbar()
     plt.scatter([l_opt], [sigma_f_opt], label='OPT',
@@ -0,0 +1,122 @@
+from enum import IntEnum
+from typing import Optional
+
+import numpy as np
+from scipy.linalg import solve_triangular
+
+try:
+    from src.kernels import kernel_diag, kernel_se
+except ModuleNotFoundError:  # executed as a script from within src
+    from kernels import kernel_diag, kernel_se
+
+
+class SparseApproximation(IntEnum):
+    FITC = 0  # fully independent training conditional, exact prior variance on the training points
+    VFE = 1  # variational free energy (Titsias), the training points only see the inducing points
+
+
+class SparseGPPredictor:
+    """
+    Inducing point approximation of the GP posterior for large training sets. The training points interact only
+    through m inducing points Z, i.e. K_nn is replaced by Q_nn = K_nm K_mm^-1 K_mn (plus the diagonal correction
+    diag(K_nn - Q_nn) for FITC). Fitting costs O(n m^2) time and O(m batch_size) memory, each prediction O(m^2) per
+    test point. With Z = X_train both approximations are exact.
+    """
+
+    def __init__(self, X_train: np.ndarray, Y_train: np.ndarray, l: float, sigma_n: float, sigma_f: float,
+                 num_inducing: int = 100, kernel: callable = kernel_se,
+                 approximation: SparseApproximation = SparseApproximation.FITC, inducing: Optional[np.ndarray] = None,
+                 seed: Optional[int] = None, batch_size: int = 4096, jitter: float = 1e-8) -> None:
+        """
+        Init
+        :param X_train: training inputs, (n, d) array (or (n, ) for d = 1)
+        :param Y_train: training targets
+        :param l: length-scale
+        :param sigma_n: variance for points in data
+        :param sigma_f: signal standard deviation
+        :param num_inducing: number of inducing points m, drawn from the training inputs without replacement
+        :param kernel: kernel function k(x_1, x_2, l, sigma_f), e.g. one of src.kernels
+        :param approximation: FITC or VFE
+        :param inducing: optional (m, d) array of inducing points, overrides num_inducing
+        :param seed: seed for drawing the inducing points
+        :param batch_size: number of training points per batch while fitting
+        :param jitter: added to the diagonal of K_mm for numerical stability, relative to sigma_f^2
+        """
+        assert num_inducing > 0
+        X_train = self._as_matrix(X_train)
+        Y_train = np.asarray(Y_train, dtype=float).reshape(-1)
+        self.l, self.sigma_n, self.sigma_f = l, sigma_n, sigma_f
+        self.kernel = kernel
+        self.approximation = approximation
+        if inducing is None:
+            ids = np.random.RandomState(seed).choice(len(X_train), size=min(num_inducing, len(X_train)),
+                                                     replace=False)
+            inducing = X_train[np.sort(ids)]
+        self.Z = self._as_matrix(inducing)
+        m = len(self.Z)
+        K_mm = kernel(self.Z, self.Z, l, sigma_f) + jitter * sigma_f ** 2 * np.eye(m)
+        self.L_m = np.linalg.cholesky(K_mm)
+
+        # A = I + V Lambda^-1 V^T and c = V Lambda^-1 y with V = L_m^-1 K_mn, accumulated over batches of training
+        # points so K_mn is never stored completely
+        A = np.eye(m)
+        c = np.zeros(m)
+        for start in range(0, len(X_train), batch_size):
+            X_batch, Y_batch = X_train[start:start + batch_size], Y_train[start:start + batch_size]
+            V = solve_triangular(self.L_m, kernel(self.Z, X_batch, l, sigma_f), lower=True)
+            noise = np.full(len(X_batch), sigma_n ** 2)
+            if approximation == SparseApproximation.FITC:
+                noise += np.maximum(kernel_diag(kernel, X_batch, l, sigma_f) - np.sum(V ** 2, axis=0), 0.)
+            elif approximation != SparseApproximation.VFE:
+                raise NotImplementedError
+            V_scaled = V / noise
+            A += V_scaled @ V.T
+            c += V_scaled @ Y_batch
+        self.L_A = np.linalg.cholesky(A)
+        self.beta = solve_triangular(self.L_A, c, lower=True)
+
+    @staticmethod
+    def _as_matrix(X: np.ndarray) -> np.ndarray:
+        X = np.asarray(X, dtype=float)
+        return X.reshape(-1, 1) if X.ndim < 2 else X
+
+    def predict(self, X: np.ndarray, batch_size: int = 4096) -> (np.ndarray, np.ndarray):
+        """
+        Approximate posterior mean and variance, same outputs as GPPredictor.predict
+        :param X: Data to predict the mean and variance
+        :param batch_size: number of test points per batch
+        :return: mean and variance for all points in X
+        """
+        X = self._as_matrix(X)
+        means = np.empty(len(X))
+        variances = np.empty(len(X))
+        for start in range(0, len(X), batch_size):
+            X_batch = X[start:start + batch_size]
+            V_star = solve_triangular(self.L_m, self.kernel(self.Z, X_batch, self.l, self.sigma_f), lower=True)
+            W_star = solve_triangular(self.L_A, V_star, lower=True)
+            means[start:start + batch_size] = W_star.T @ self.beta
+            variances[start:start + batch_size] = kernel_diag(self.kernel, X_batch, self.l, self.sigma_f) - \
+                np.sum(V_star ** 2, axis=0) + np.sum(W_star ** 2, axis=0)
+        return means, variances
+
+
+def gp_prediction_sparse(data: np.ndarray, X: np.ndarray, l: float, sigma_n: float, sigma_f: float,
+                         num_inducing: int = 100, kernel: callable = kernel_se,
+                         approximation: SparseApproximation = SparseApproximation.FITC, seed: Optional[int] = None) \
+        -> (np.ndarray, np.ndarray):
+    """
+    Sparse counterpart of gp_prediction_b_kernel
+    :param data: Data on which the model is fit, (x, y) rows
+    :param X: Data to predict the mean and variance
+    :param l: length-scale
+    :param sigma_n: variance for points in data
+    :param sigma_f: signal standard deviation
+    :param num_inducing: number of inducing points
+    :param kernel: kernel function k(x_1, x_2, l, sigma_f), e.g. one of src.kernels
+    :param approximation: FITC or VFE
+    :param seed: seed for drawing the inducing points
+    :return: mean and variance for all points in X
+    """
+    data = np.asarray(data, dtype=float)
+    return SparseGPPredictor(data[:, 0], data[:, 1], l, sigma_n, sigma_f, num_inducing, kernel, approximation,
+                             seed=seed).predict(X)
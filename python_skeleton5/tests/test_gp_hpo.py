@@ -2,9 +2,10 @@ import unittest
 
 import matplotlib
 import numpy as np
-from scipy.optimize import minimize
+from scipy.optimize import approx_fprime, minimize
 
-from src.main import negative_log_likelihood
+from src.kernels import kernel_matern32, kernel_matern52, kernel_se
+from src.main import fit_hyperparameters, negative_log_likelihood, nll_landscape
 
 matplotlib.use('Agg')
 
@@ -29,6 +30,58 @@ class TestGPHPO(unittest.TestCase):
         self.assertTrue(np.isclose(sigma_f_opt, 3.477364782409653))
         self.assertTrue(np.isclose(sigma_n_opt, 0.3585607633219344))
 
+    def test_gradient(self):
+        """
+        Test the analytic gradients against finite differences, in natural and in log-space
+        """
+        np.random.seed(666)
+        train_data = np.array([(np.random.uniform(0, 2 * np.pi), np.sin(x) + 1.5 * np.random.random() * 5) for x in
+                               np.linspace(0, 2 * np.pi, 9)])
+        theta = np.array([0.7, 2.0, 0.4])
+        for kernel in [kernel_se, kernel_matern32, kernel_matern52]:
+            for log_space, x in [(False, theta), (True, np.log(theta))]:
+                nll = negative_log_likelihood(train_data, kernel, log_space=log_space)
+                value, grad = negative_log_likelihood(train_data, kernel, gradient=True, log_space=log_space)(x)
+                self.assertTrue(np.isclose(nll(x), value))
+                self.assertTrue(np.allclose(approx_fprime(x, nll, 1e-7), grad, rtol=1e-4, atol=1e-5))
+
+    def test_multi_start(self):
+        """
+        Test the multi-start fit finds the optimum of test_hpo and does not depend on the number of workers
+        """
+        np.random.seed(666)
+        train_data = np.array([(np.random.uniform(0, 2 * np.pi), np.sin(x) + 1.5 * np.random.random() * 5) for x in
+                               np.linspace(0, 2 * np.pi, 9)])
+        res = fit_hyperparameters(train_data, x0=[0.3, 1.0, 0.5], num_starts=4, seed=0, max_workers=1)
+        self.assertTrue(np.allclose([0.7329739536458941, 3.477364782409653, 0.3585607633219344], res.x, rtol=1e-3))
+        res_parallel = fit_hyperparameters(train_data, x0=[0.3, 1.0, 0.5], num_starts=4, seed=0, max_workers=2)
+        self.assertTrue(np.allclose(res.x, res_parallel.x))
+        self.assertTrue(np.isclose(res.fun, res_parallel.fun))
+
+    def test_landscape(self):
+        """
+        Test the batched landscape against single evaluations, including cells where K_y is not positive definite
+        """
+        np.random.seed(666)
+        train_data = np.array([(np.random.uniform(0, 2 * np.pi), np.sin(x) + 1.5 * np.random.random() * 5) for x in
+                               np.linspace(0, 2 * np.pi, 9)])
+        l, sigma_f, sigma_n = np.meshgrid(np.logspace(-2, 3, 7), np.logspace(-1, 1, 5), [0., 0.4], indexing='ij')
+        for kernel in [kernel_se, kernel_matern52]:
+            nll = negative_log_likelihood(train_data, kernel)
+            expected = np.full(l.shape, np.nan)
+            for i in np.ndindex(l.shape):
+                try:
+                    expected[i] = nll([l[i], sigma_f[i], sigma_n[i]])
+                except np.linalg.LinAlgError:
+                    pass
+            self.assertTrue(np.any(np.isnan(expected)))
+            for chunk_size, max_workers in [(512, 1), (8, 1), (16, 2)]:
+                landscape = nll_landscape(train_data, l, sigma_f, sigma_n, kernel, chunk_size, max_workers)
+                self.assertEqual(l.shape, landscape.shape)
+                self.assertTrue(np.array_equal(np.isnan(expected), np.isnan(landscape)))
+                # without noise the positive definite cells are too ill-conditioned to compare values
+                self.assertTrue(np.allclose(expected[..., 1], landscape[..., 1]))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,47 @@
+import unittest
+
+import matplotlib
+import numpy as np
+
+from src.main import GPPredictor, gp_prediction_b_kernel, kernel_se
+
+matplotlib.use('Agg')
+
+
+class TestGPPredictor(unittest.TestCase):
+
+    def setUp(self):
+        np.random.seed(666)
+        self.train_data = np.array([(np.random.uniform(0, 2 * np.pi), np.sin(x) + 1.5 * np.random.random() * 5)
+                                    for x in np.linspace(0, 2 * np.pi, 9)])
+        self.X = np.linspace(0, 2 * np.pi, 128, endpoint=False)
+
+    def test_matches_dense_posterior(self):
+        """
+        Test the cached Cholesky predictor gives the same posterior as the textbook formulas with explicit inverse.
+        """
+        l, sigma_n, sigma_f = 0.7, 0.4, 1.0
+        X_train, Y_train = self.train_data[:, 0].reshape(-1, 1), self.train_data[:, 1]
+        K_y_inv = np.linalg.inv(kernel_se(X_train, X_train, l, sigma_f) + sigma_n ** 2 * np.eye(len(X_train)))
+        K_star = kernel_se(X_train, self.X.reshape(-1, 1), l, sigma_f)
+        K_starstar = kernel_se(self.X.reshape(-1, 1), self.X.reshape(-1, 1), l, sigma_f)
+        mean, var = gp_prediction_b_kernel(self.train_data, self.X, l=l, sigma_n=sigma_n, sigma_f=sigma_f)
+        self.assertTrue(np.allclose(K_star.T @ K_y_inv @ Y_train, mean))
+        self.assertTrue(np.allclose(np.diag(K_starstar - K_star.T @ K_y_inv @ K_star), var))
+
+    def test_batches(self):
+        """
+        Test the batch size does not change the prediction and large test sets can be predicted.
+        """
+        gp = GPPredictor(self.train_data[:, 0], self.train_data[:, 1], l=0.7, sigma_n=0.4, sigma_f=1.0)
+        mean, var = gp.predict(self.X)
+        mean_batched, var_batched = gp.predict(self.X, batch_size=10)
+        self.assertTrue(np.allclose(mean, mean_batched))
+        self.assertTrue(np.allclose(var, var_batched))
+        mean, var = gp.predict(np.linspace(-10, 10, 100_000))
+        self.assertEqual((100_000,), var.shape)
+        self.assertTrue(np.all(var > 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import unittest
+
+import matplotlib
+import numpy as np
+
+from src.kernels import kernel_diag, kernel_matern32, kernel_matern52, kernel_se, sq_distances
+from src.main import GPPredictor, negative_log_likelihood
+
+matplotlib.use('Agg')
+
+
+class TestKernels(unittest.TestCase):
+
+    def setUp(self):
+        np.random.seed(0)
+        self.x_1 = np.random.uniform(-3, 3, (20, 3))
+        self.x_2 = np.random.uniform(-3, 3, (15, 3))
+
+    def test_sq_distances(self):
+        """
+        Test the BLAS formulation against explicit differences, with one and with ARD length scales.
+        """
+        l = np.array([.5, 1., 2.])
+        diff = (self.x_1[:, None, :] - self.x_2[None, :, :]) / l
+        self.assertTrue(np.allclose(np.sum(diff ** 2, axis=-1), sq_distances(self.x_1, self.x_2, l)))
+        self.assertTrue(np.all(sq_distances(self.x_1, self.x_1) >= 0))
+        x = np.linspace(0, 1, 5)
+        self.assertTrue(np.allclose((x[:, None] - x[None, :]) ** 2, sq_distances(x, x)))
+
+    def test_kernels(self):
+        """
+        Test the kernels against their closed forms in terms of r = |x_1 - x_2| / l, including sigma_f.
+        """
+        l, sigma_f = 1.3, 2.
+        r = np.sqrt(np.sum((self.x_1[:, None, :] - self.x_2[None, :, :]) ** 2, axis=-1)) / l
+        self.assertTrue(np.allclose(sigma_f ** 2 * np.exp(-r ** 2 / 2), kernel_se(self.x_1, self.x_2, l, sigma_f)))
+        self.assertTrue(np.allclose(sigma_f ** 2 * (1 + np.sqrt(3) * r) * np.exp(-np.sqrt(3) * r),
+                                    kernel_matern32(self.x_1, self.x_2, l, sigma_f)))
+        self.assertTrue(np.allclose(sigma_f ** 2 * (1 + np.sqrt(5) * r + 5 / 3 * r ** 2) * np.exp(-np.sqrt(5) * r),
+                                    kernel_matern52(self.x_1, self.x_2, l, sigma_f)))
+
+    def test_diag(self):
+        """
+        Test the diagonal evaluation for stationary and for other kernels.
+        """
+        def linear(x_1, x_2, l, sigma_f):
+            return sigma_f ** 2 * x_1 @ x_2.T / l ** 2
+
+        for kernel in [kernel_se, kernel_matern32, kernel_matern52, linear]:
+            self.assertTrue(np.allclose(np.diag(kernel(self.x_1, self.x_1, .7, 1.5)),
+                                        kernel_diag(kernel, self.x_1, .7, 1.5)))
+
+    def test_gp_with_kernels(self):
+        """
+        Test the GP and the negative log likelihood accept every kernel and multi-dimensional inputs.
+        """
+        y = np.sin(self.x_1[:, 0]) + self.x_1[:, 1]
+        for kernel in [kernel_se, kernel_matern32, kernel_matern52]:
+            gp = GPPredictor(self.x_1, y, np.array([1., 1., 5.]), .1, 1., kernel=kernel)
+            mean, var = gp.predict(self.x_2)
+            self.assertEqual((15,), mean.shape)
+            self.assertTrue(np.all(var > 0))
+            data = np.array([(x, np.sin(x)) for x in np.linspace(0, 2 * np.pi, 9)])
+            self.assertTrue(np.isfinite(negative_log_likelihood(data, kernel)([1., 1., .1])).all())
+
+
+if __name__ == '__main__':
+    unittest.main()
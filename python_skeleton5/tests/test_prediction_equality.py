@@ -3,7 +3,7 @@ import unittest
 import matplotlib
 import numpy as np
 
-from src.main import gp_prediction_a, gp_prediction_b, phi_n_of_x
+from src.main import gp_prediction, gp_prediction_a, gp_prediction_b, phi_n_of_x
 
 matplotlib.use('Agg')
 
@@ -22,6 +22,27 @@ class TestAlgoEquality(unittest.TestCase):
         mean2, var2 = gp_prediction_b(train_data, X, phi_n_of_x(num_features), 1.0, np.eye(num_features))
         self.assertTrue(np.allclose(mean1, mean2), np.allclose(var1, var2))
 
+    def test_batched_prediction(self):
+        """
+        Test the batched implementations against the textbook formulas for single test points and that gp_prediction
+        picks the implementation with the smaller matrix to factorize.
+        """
+        train_data = np.array([(np.array(x), np.sin(x) + 0.2 * np.cos(13 * x)) for x in np.linspace(0, 2, 8)])
+        X = np.linspace(0, 2, 5)
+        phi_X = phi_n_of_x(3)(train_data[:, 0])
+        A_inv = np.linalg.inv(phi_X @ phi_X.T / 0.5 + np.eye(3))
+        for num_features, Sigma_p in [(3, np.eye(3)), (16, np.eye(16))]:
+            phi = phi_n_of_x(num_features)
+            for prediction in [gp_prediction_a, gp_prediction_b, gp_prediction]:
+                mean, var = prediction(train_data, X, phi, 0.5, Sigma_p)
+                self.assertEqual((5,), mean.shape)
+                self.assertEqual((5,), var.shape)
+                if num_features == 3:
+                    self.assertTrue(np.allclose([phi(x) @ A_inv @ phi_X @ train_data[:, 1] / 0.5 for x in X], mean))
+                    self.assertTrue(np.allclose([phi(x) @ A_inv @ phi(x) for x in X], var))
+            self.assertTrue(np.allclose(gp_prediction_b(train_data, X, phi, 0.5, Sigma_p),
+                                        gp_prediction_a(train_data, X, phi, 0.5, Sigma_p), rtol=1e-4))
+
 
 if __name__ == '__main__':
     unittest.main()
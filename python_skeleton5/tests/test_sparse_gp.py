@@ -0,0 +1,53 @@
+import unittest
+
+import matplotlib
+import numpy as np
+
+from src.kernels import kernel_matern52, kernel_se
+from src.main import GPPredictor, gp_prediction_b_kernel
+from src.sparse_gp import SparseApproximation, SparseGPPredictor, gp_prediction_sparse
+
+matplotlib.use('Agg')
+
+
+class TestSparseGP(unittest.TestCase):
+
+    def setUp(self):
+        np.random.seed(666)
+        self.train_data = np.array([(np.random.uniform(0, 2 * np.pi), np.sin(x) + 1.5 * np.random.random() * 5)
+                                    for x in np.linspace(0, 2 * np.pi, 9)])
+        self.X = np.linspace(0, 2 * np.pi, 128, endpoint=False)
+
+    def test_exact_with_all_inducing_points(self):
+        """
+        Test both approximations are exact if every training point is an inducing point.
+        """
+        mean, var = gp_prediction_b_kernel(self.train_data, self.X, l=0.7, sigma_n=0.4, sigma_f=2.)
+        for approximation in SparseApproximation:
+            mean_sparse, var_sparse = gp_prediction_sparse(self.train_data, self.X, l=0.7, sigma_n=0.4, sigma_f=2.,
+                                                           num_inducing=9, approximation=approximation)
+            self.assertTrue(np.allclose(mean, mean_sparse, atol=1e-5))
+            self.assertTrue(np.allclose(var, var_sparse, atol=1e-5))
+
+    def test_large_training_set(self):
+        """
+        Test a few inducing points approximate the exact posterior of many training points closely.
+        """
+        X_train = np.random.uniform(0, 10, (2000, 2))
+        Y_train = np.sin(X_train[:, 0]) * np.cos(X_train[:, 1]) + 0.1 * np.random.randn(2000)
+        X_test = np.random.uniform(0, 10, (500, 2))
+        # the rougher Matern kernel needs more inducing points
+        for kernel, num_inducing, tolerance in [(kernel_se, 150, 0.01), (kernel_matern52, 300, 0.1)]:
+            mean, var = GPPredictor(X_train, Y_train, 2., 0.1, 1., kernel=kernel).predict(X_test)
+            for approximation in SparseApproximation:
+                gp = SparseGPPredictor(X_train, Y_train, 2., 0.1, 1., num_inducing=num_inducing, kernel=kernel,
+                                       approximation=approximation, seed=0, batch_size=300)
+                mean_sparse, var_sparse = gp.predict(X_test, batch_size=128)
+                self.assertEqual((500,), mean_sparse.shape)
+                self.assertTrue(np.all(var_sparse > 0))
+                self.assertLess(np.max(np.abs(mean - mean_sparse)), tolerance)
+                self.assertLess(np.max(np.abs(var - var_sparse)), tolerance)
+
+
+if __name__ == '__main__':
+    unittest.main()
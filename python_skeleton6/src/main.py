@@ -1,6 +1,9 @@
 import argparse
 import logging
-from functools import partial
+import time
+from concurrent.futures import FIRST_COMPLETED, Executor, ThreadPoolExecutor, wait
+from enum import IntEnum
+from typing import Optional
 
 import matplotlib.pyplot as plt
 import numpy as np
@@ -11,12 +14,22 @@ from sklearn.gaussian_process.kernels import Matern
 from sklearn.pipeline import Pipeline
 from sklearn.preprocessing import StandardScaler
 
-from scipy.stats import norm
+from scipy.stats import norm, qmc
+
+try:
+    from src.surrogate import IncrementalGP
+except ModuleNotFoundError:  # executed as a script from within src
+    from surrogate import IncrementalGP
 
 rcParams.update({'figure.autolayout': True})
 plt.style.use('seaborn-whitegrid')
 
 
+class BatchStrategy(IntEnum):
+    KRIGING_BELIEVER = 0  # pending points are fantasized with the posterior mean
+    CONSTANT_LIAR = 1  # pending points are fantasized with the best so far seen value
+
+
 def f(x):
     """
     Function to minimize. (Levy1D see https://www.sfu.ca/~ssurjano/levy.html). Global min value: 0.0
@@ -37,42 +50,121 @@ def f(x):
     return y
 
 
-def EI(x, model, eta, add=None):
+def _candidates(x):
+    """A single point (scalar or 1-d) becomes a (1, d) array, (n, d) arrays of n candidates stay as they are"""
+    x = np.asarray(x, dtype=float)
+    return x.reshape(1, -1) if x.ndim < 2 else x
+
+
+def EI(x, model, eta, add=None, return_gradient=False):
     """
-    Expected Improvement.
-    :param x: point to determine the acquisition value
-    :param model: GP to predict target function value
+    (Negative) Expected Improvement, vectorized over candidates.
+    :param x: point or (n, d) array of candidates to determine the acquisition value
+    :param model: GP to predict target function value, needs predict_gradient (see IncrementalGP) for the gradient
     :param eta: best so far seen value
     :param add: additional parameters necessary for the function
+    :param return_gradient: also return the (n, d) gradient with respect to x
+    :return: (n, ) acquisition values
     """
-    x = np.array([x]).reshape([-1, 1])
-    m, s = model.predict(x, return_std=True)
-    
-    if s == 0:
-        s = 1e-9
-    
-    d = norm(loc=0, scale=1)
-    
+    x = _candidates(x)
+    if return_gradient:
+        m, s, dm, ds = model.predict_gradient(x)
+    else:
+        m, s = model.predict(x, return_std=True)
+    m, s = np.ravel(m), np.ravel(s)
+    s = np.where(s == 0, 1e-9, s)
+
     Z = (eta - m) / s
-    
-    return -s * (Z * d.cdf(Z) + d.pdf(Z))
+    cdf, pdf = norm.cdf(Z), norm.pdf(Z)
+    ei = -s * (Z * cdf + pdf)
+    if not return_gradient:
+        return ei
+    # d EI = -cdf(Z) dm + pdf(Z) ds
+    return ei, cdf[:, None] * dm - pdf[:, None] * ds
 
 
-def LCB(x, model, eta, add=None):
+def LCB(x, model, eta, add=None, return_gradient=False):
     """
-    Lower Confidence Bound
-    :param x: point to determine the acquisition value
-    :param model: GP to predict target function value
+    Lower Confidence Bound, vectorized over candidates.
+    :param x: point or (n, d) array of candidates to determine the acquisition value
+    :param model: GP to predict target function value, needs predict_gradient (see IncrementalGP) for the gradient
     :param eta: best so far seen value
     :param add: additional parameters necessary for the function
+    :param return_gradient: also return the (n, d) gradient with respect to x
+    :return: (n, ) acquisition values
+    """
+    x = _candidates(x)
+    if return_gradient:
+        m, s, dm, ds = model.predict_gradient(x)
+    else:
+        m, s = model.predict(x, return_std=True)
+    m, s = np.ravel(m), np.ravel(s)
+    s = np.where(s == 0, 1e-9, s)
+
+    if not return_gradient:
+        return m - add * s
+    return m - add * s, dm - add * ds
+
+
+def optimize_acquisition(acquisition, model, eta, add=None, bounds=((-15, 10),), num_candidates=1024, top_k=5,
+                         sobol=True, maxiter=50, max_workers=None, seed=None):
+    """
+    Multi-start acquisition optimization. All candidates of a random (or scrambled Sobol) design are scored in one
+    vectorized call, then L-BFGS-B refines the top_k of them concurrently in a thread pool (numpy releases the GIL in
+    the linear algebra). Analytic gradients are used if the model provides predict_gradient
+    :param acquisition: vectorized acquisition function to minimize, e.g. EI or LCB
+    :param model: GP to predict target function value
+    :param eta: best so far seen value
+    :param add: additional parameters necessary for the acquisition function
+    :param bounds: (low, high) per input dimension
+    :param num_candidates: size of the screening design
+    :param top_k: number of L-BFGS-B runs, started from the best candidates
+    :param sobol: screen a scrambled Sobol sequence instead of uniform random points
+    :param maxiter: maximum iterations per L-BFGS-B run
+    :param max_workers: number of threads for the refinement. 1 runs everything in this thread
+    :param seed: seed of the screening design, drawn from numpy's global random state if None
+    :return: best point, its acquisition value and a dict with timing stats
     """
-    x = np.array([x]).reshape([-1, 1])
-    m, s = model.predict(x, return_std=True)
-    
-    if s == 0:
-        s = 1e-9
-    
-    return m - add * s
+    assert 0 < top_k <= num_candidates
+    if seed is None:
+        seed = np.random.randint(2 ** 31 - 1)
+    bounds = np.asarray(bounds, dtype=float)
+    start = time.perf_counter()
+    if sobol:
+        unit = qmc.Sobol(len(bounds), seed=seed).random_base2(int(np.ceil(np.log2(num_candidates))))[:num_candidates]
+    else:
+        unit = np.random.RandomState(seed).uniform(size=(num_candidates, len(bounds)))
+    candidates = bounds[:, 0] + unit * (bounds[:, 1] - bounds[:, 0])
+    values = acquisition(candidates, model, eta, add)
+    starts = candidates[np.argsort(values)[:top_k]]
+    screening_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    gradient = hasattr(model, 'predict_gradient')
+
+    def objective(x):
+        if gradient:
+            value, grad = acquisition(x, model, eta, add, return_gradient=True)
+            return value[0], grad[0]
+        return acquisition(x, model, eta, add)[0]
+
+    def refine(x0):
+        return minimize(objective, x0, jac=gradient, bounds=bounds, method='L-BFGS-B', options={'maxiter': maxiter})
+
+    if max_workers == 1:
+        results = list(map(refine, starts))
+    else:
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            results = list(pool.map(refine, starts))
+    refinement_time = time.perf_counter() - start
+
+    best = min(results, key=lambda res: res.fun)
+    x_best, value_best = best.x, float(best.fun)
+    if np.min(values) < value_best:  # the refinement should never be worse, but keep the best screened point then
+        x_best, value_best = candidates[np.argmin(values)], float(np.min(values))
+    stats = dict(screening_time=screening_time, refinement_time=refinement_time, num_candidates=num_candidates,
+                 num_starts=len(starts), num_evaluations=num_candidates + sum(res.nfev for res in results))
+    return x_best, value_best, stats
 
 
 def run_random_search(max_iter, seed=1):
@@ -101,48 +193,163 @@ def run_grid_search(max_iter, grid_size=1):
     return y
 
 
-def run_bo(acquisition, max_iter, init=25, random=True, acq_add=1, seed=1):
+def run_bo(acquisition, max_iter, init=25, random=True, acq_add=1, seed=1, refit_interval=10):
     """
     BO
     :param max_iter: max number of function calls
     :param init: number of points to build initial model
     :param seed: seed used to keep experiments reproducible
     :param random: if False initial points are linearly sampled in the bounds, otherwise uniformly random.
+    :param refit_interval: the surrogate is updated with every new point, its hyperparameters are re-optimized after
+                           this many points (see IncrementalGP)
     :return: all evaluated points
     """
     # sample initial query points
     np.random.seed(seed)
-    if random:
-        x = np.random.uniform(-15, 10, init).reshape(-1, 1).tolist()
-    else:
-        x = np.linspace(-15, 10, init).reshape(-1, 1).tolist()
+    x = _initial_design(init, random)
     # get corresponding response values
     y = list(map(f, x))
 
+    # Feel free to adjust the hyperparameters
+    gp = IncrementalGP(kernel=Matern(nu=2.5), n_restarts_optimizer=10, refit_interval=refit_interval,
+                       random_state=seed)
+    gp.fit(x, y)  # fit the model
     for i in range(max_iter - init):  # BO loop
         logging.debug('Sample #%d' % (init + i))
+
+        # optimize acquisition function: screen a Sobol design, refine the best 5 candidates, use best result
         # Feel free to adjust the hyperparameters
-        gp = Pipeline([["standardize", StandardScaler()],
-                       ["GP", GPR(kernel=Matern(nu=2.5), normalize_y=True, n_restarts_optimizer=10, random_state=seed)],
-                       ])
-        gp.fit(x, y)  # fit the model
-
-        # Partially initialize the acquisition function to work with the fmin interface
-        # (only the x parameter is not specified)
-        # TODO implement different acquisition functions
-        acqui = partial(acquisition, model=gp, eta=min(y), add=acq_add)
-        # optimize acquisition function, repeat 10 times, use best result
-        x_ = None
-        y_ = 10000
-        # Feel free to adjust the hyperparameters
-        for i in range(10):
-            opt_res = minimize(acqui, np.random.uniform(-15, 10), bounds=[[-15, 10]], options={"maxfun": 10},
-                               method="L-BFGS-B")
-            if opt_res.fun[0] < y_:
-                x_ = opt_res.x
-                y_ = opt_res.fun[0]
+        x_, _, stats = optimize_acquisition(acquisition, gp, min(y), acq_add, bounds=[[-15, 10]], num_candidates=256,
+                                            top_k=5)
+        logging.debug('Acquisition optimization: %s', stats)
         x.append(x_)
         y.append(f(x_))
+        gp.add(x_, y[-1])  # update the model
+    return y
+
+
+def _initial_design(init, random):
+    """Initial query points of the BO loops, uses numpy's global random state"""
+    if random:
+        return np.random.uniform(-15, 10, init).reshape(-1, 1).tolist()
+    return np.linspace(-15, 10, init).reshape(-1, 1).tolist()
+
+
+def run_batch_bo(acquisition, max_iter, q=4, init=25, random=True, acq_add=1, seed=1, refit_interval=10,
+                 strategy=BatchStrategy.KRIGING_BELIEVER, func=f, executor: Optional[Executor] = None,
+                 max_workers=None):
+    """
+    Batch BO, proposes q points per iteration and evaluates them concurrently.
+    The points of a batch are proposed one after the other, each one on a copy of the surrogate that treats the
+    points proposed before as observed (see BatchStrategy). All results are added to the surrogate before the next
+    batch is proposed
+    :param acquisition: acquisition function, e.g. EI or LCB
+    :param max_iter: max number of function calls
+    :param q: batch size
+    :param init: number of points to build initial model
+    :param random: if False initial points are linearly sampled in the bounds, otherwise uniformly random.
+    :param acq_add: additional parameters of the acquisition function
+    :param seed: seed used to keep experiments reproducible
+    :param refit_interval: the surrogate hyperparameters are re-optimized after this many points (see IncrementalGP)
+    :param strategy: how pending points of a batch are fantasized
+    :param func: function to minimize
+    :param executor: executor to evaluate func with, e.g. a ProcessPoolExecutor (then func has to be picklable). A
+                     thread pool with max_workers threads is created if None
+    :param max_workers: number of threads if no executor is given. 1 evaluates in this thread
+    :return: all evaluated points, in the order they were proposed (like run_bo)
+    """
+    assert q > 0
+    np.random.seed(seed)
+    x = _initial_design(init, random)
+    y = list(map(func, x))
+
+    owns_executor = executor is None and max_workers != 1
+    if owns_executor:
+        executor = ThreadPoolExecutor(max_workers=max_workers or q)
+    try:
+        gp = IncrementalGP(kernel=Matern(nu=2.5), n_restarts_optimizer=10, refit_interval=refit_interval,
+                           random_state=seed)
+        gp.fit(x, y)
+        while len(y) < max_iter:  # BO loop
+            logging.debug('Batch starting at sample #%d' % len(y))
+            batch = []
+            model = gp
+            for j in range(min(q, max_iter - len(y))):
+                x_, _, _ = optimize_acquisition(acquisition, model, min(y), acq_add, bounds=[[-15, 10]],
+                                                num_candidates=256, top_k=5)
+                batch.append(x_)
+                if strategy == BatchStrategy.KRIGING_BELIEVER:
+                    lie = model.predict(x_)[0]
+                elif strategy == BatchStrategy.CONSTANT_LIAR:
+                    lie = min(y)
+                else:
+                    raise NotImplementedError
+                model = model.fantasize(x_, lie)
+            y_batch = list(executor.map(func, batch)) if executor is not None else list(map(func, batch))
+            x.extend(batch)
+            y.extend(y_batch)
+            gp.add(np.array(batch), y_batch)  # update the model with the real results
+    finally:
+        if owns_executor:
+            executor.shutdown()
+    return y
+
+
+def run_async_bo(acquisition, max_iter, num_workers=4, init=25, random=True, acq_add=1, seed=1, refit_interval=10,
+                 func=f, executor: Optional[Executor] = None):
+    """
+    Asynchronous BO, keeps num_workers evaluations of func running at all times.
+    Whenever a worker is free a new point is proposed on a copy of the surrogate that fantasizes the pending points
+    with the posterior mean (Kriging believer). Every result is added to the surrogate as soon as it arrives, so
+    no worker waits for the slowest evaluation of a batch
+    :param acquisition: acquisition function, e.g. EI or LCB
+    :param max_iter: max number of function calls
+    :param num_workers: number of concurrent evaluations
+    :param init: number of points to build initial model
+    :param random: if False initial points are linearly sampled in the bounds, otherwise uniformly random.
+    :param acq_add: additional parameters of the acquisition function
+    :param seed: seed used to keep experiments reproducible
+    :param refit_interval: the surrogate hyperparameters are re-optimized after this many points (see IncrementalGP)
+    :param func: function to minimize
+    :param executor: executor to evaluate func with, e.g. a ProcessPoolExecutor (then func has to be picklable). A
+                     thread pool with num_workers threads is created if None
+    :return: all evaluated points, in the order their evaluations finished
+    """
+    assert num_workers > 0
+    np.random.seed(seed)
+    x = _initial_design(init, random)
+    y = list(map(func, x))
+
+    owns_executor = executor is None
+    if owns_executor:
+        executor = ThreadPoolExecutor(max_workers=num_workers)
+    pending = {}  # future -> point
+    try:
+        gp = IncrementalGP(kernel=Matern(nu=2.5), n_restarts_optimizer=10, refit_interval=refit_interval,
+                           random_state=seed)
+        gp.fit(x, y)
+        while len(y) < max_iter:  # BO loop
+            # keep all workers busy
+            while len(pending) < num_workers and len(y) + len(pending) < max_iter:
+                model = gp
+                if pending:
+                    pending_x = np.array(list(pending.values()))
+                    model = gp.fantasize(pending_x, gp.predict(pending_x))
+                x_, _, _ = optimize_acquisition(acquisition, model, min(y), acq_add, bounds=[[-15, 10]],
+                                                num_candidates=256, top_k=5)
+                logging.debug('Submitting sample #%d, %d pending' % (len(y) + len(pending), len(pending)))
+                pending[executor.submit(func, x_)] = x_
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                x_ = pending.pop(future)
+                x.append(x_)
+                y.append(future.result())
+                gp.add(x_, y[-1])  # update the model as soon as a result arrives
+    finally:
+        for future in pending:
+            future.cancel()
+        if owns_executor:
+            executor.shutdown()
     return y
 
 
@@ -159,8 +366,8 @@ def main(num_evals, init_size, repetitions, random, seed):
     x_axis = np.linspace(-15, 10, 500)
     y_func = [f([i, ]) for i in x_axis]
 
-    ei = np.array([EI(i, gp, min(y)) for i in x_axis]).flatten()
-    lcb = np.array([LCB(i, gp, min(y), 1) for i in x_axis]).flatten()
+    ei = EI(x_axis.reshape(-1, 1), gp, min(y))
+    lcb = LCB(x_axis.reshape(-1, 1), gp, min(y), 1)
     m, s = gp.predict(x_axis.reshape([-1, 1]), return_std=True)
     m = m.flatten()
     s = s.flatten()
@@ -0,0 +1,184 @@
+import copy
+import logging
+from typing import Optional
+
+import numpy as np
+from scipy.linalg import cho_solve, solve_triangular
+from sklearn.gaussian_process import GaussianProcessRegressor as GPR
+from sklearn.gaussian_process.kernels import RBF, Kernel, Matern
+
+
+class IncrementalGP:
+    """
+    GP surrogate for BO that is updated instead of refitted when observations are added.
+    Inputs are standardized and targets normalized like the Pipeline(StandardScaler, GPR(normalize_y=True)) of
+    run_bo. Adding a point extends the Cholesky factor of K_y by one row, O(n^2) instead of O(n^3). The kernel
+    hyperparameters (and the input scaling, which K depends on) are only re-optimized every refit_interval added points
+    or when the log marginal likelihood per point drifts by more than drift_tolerance from its value after the last
+    optimization. Re-optimization starts from the previous optimum.
+    Provides predict(X, return_std) like the sklearn models, so EI and LCB work with it, and predict_gradient for
+    gradient-based acquisition optimization.
+    """
+
+    def __init__(self, kernel: Optional[Kernel] = None, alpha: float = 1e-6, n_restarts_optimizer: int = 10,
+                 refit_interval: int = 10, drift_tolerance: float = 0.5, random_state: Optional[int] = None) -> None:
+        """
+        Init
+        :param kernel: sklearn kernel, Matern(nu=2.5) by default
+        :param alpha: noise variance added to the diagonal of K (of the normalized targets)
+        :param n_restarts_optimizer: restarts of the first hyperparameter optimization, later ones are warm-started
+                                     from the previous optimum without restarts
+        :param refit_interval: re-optimize the hyperparameters after this many added points, None to never do so
+        :param drift_tolerance: re-optimize if the log marginal likelihood per point changed by more than this since
+                                the last optimization, None to disable
+        :param random_state: seed of the first hyperparameter optimization
+        """
+        assert alpha > 0
+        assert refit_interval is None or refit_interval > 0
+        self.kernel_ = Matern(nu=2.5) if kernel is None else kernel
+        self.alpha = alpha
+        self.n_restarts_optimizer = n_restarts_optimizer
+        self.refit_interval = refit_interval
+        self.drift_tolerance = drift_tolerance
+        self.random_state = random_state
+        self.num_optimizations = 0
+        self._X, self._y = np.empty((0, 0)), np.empty(0)
+
+    def fit(self, X: np.ndarray, y: np.ndarray) -> 'IncrementalGP':
+        """
+        Fits the surrogate from scratch, including the hyperparameters
+        :param X: (n, d) array of inputs
+        :param y: (n, ) array of targets
+        :return: self
+        """
+        self._X = np.asarray(X, dtype=float).reshape(len(y), -1)
+        self._y = np.asarray(y, dtype=float).reshape(-1)
+        self._optimize()
+        return self
+
+    def add(self, X: np.ndarray, y: np.ndarray) -> None:
+        """
+        Adds observations by extending the Cholesky factor, then re-optimizes if the schedule says so
+        :param X: (k, d) array (or one point) of inputs
+        :param y: (k, ) array (or one value) of targets
+        """
+        X = np.asarray(X, dtype=float).reshape(-1, self._X.shape[1])
+        for x_i in self._scale(X):
+            k = self.kernel_(self._X_scaled, x_i[None])[:, 0]
+            l_i = solve_triangular(self.L_, k, lower=True)
+            # clipped at alpha, (almost) duplicate points must not make K_y indefinite through rounding errors
+            d = np.sqrt(max(self.kernel_.diag(x_i[None])[0] + self.alpha - l_i @ l_i, self.alpha))
+            n = len(self.L_)
+            L = np.zeros((n + 1, n + 1))
+            L[:n, :n], L[n, :n], L[n, n] = self.L_, l_i, d
+            self.L_ = L
+            self._X_scaled = np.vstack([self._X_scaled, x_i])
+        self._X = np.vstack([self._X, X])
+        self._y = np.concatenate([self._y, np.asarray(y, dtype=float).reshape(-1)])
+        self._points_since_optimization += len(X)
+        self._update_targets()
+
+        drift = abs(self.log_marginal_likelihood_ / len(self._y) - self._reference_likelihood)
+        if self.refit_interval is not None and self._points_since_optimization >= self.refit_interval:
+            self._optimize()
+        elif self.drift_tolerance is not None and drift > self.drift_tolerance:
+            logging.debug('Log marginal likelihood per point drifted by %.3f, re-optimizing', drift)
+            self._optimize()
+
+    def fantasize(self, X: np.ndarray, y: np.ndarray) -> 'IncrementalGP':
+        """
+        Copy of the surrogate with additional (fantasized) observations, e.g. the posterior mean at pending points.
+        The copy never re-optimizes the hyperparameters and this surrogate is left unchanged
+        :param X: (k, d) array (or one point) of inputs
+        :param y: (k, ) array (or one value) of targets
+        :return: the updated copy
+        """
+        fantasy = copy.copy(self)
+        fantasy.refit_interval, fantasy.drift_tolerance = None, None
+        fantasy.add(X, y)
+        return fantasy
+
+    def _scale(self, X: np.ndarray) -> np.ndarray:
+        return (X - self._x_mean) / self._x_std
+
+    def _update_targets(self) -> None:
+        """Normalizes the targets and solves for alpha_, the factor of K_y does not depend on them"""
+        self._y_mean, self._y_std = np.mean(self._y), np.std(self._y)
+        if self._y_std == 0:
+            self._y_std = 1.
+        y = (self._y - self._y_mean) / self._y_std
+        self.alpha_ = cho_solve((self.L_, True), y)
+        self.log_marginal_likelihood_ = -0.5 * y @ self.alpha_ - np.sum(np.log(np.diag(self.L_))) - \
+            0.5 * len(y) * np.log(2 * np.pi)
+
+    def _optimize(self) -> None:
+        """Re-optimizes the hyperparameters, starting from the current ones, and refactorizes K_y"""
+        self._x_mean, self._x_std = np.mean(self._X, axis=0), np.std(self._X, axis=0)
+        self._x_std[self._x_std == 0] = 1.
+        self._X_scaled = self._scale(self._X)
+        gp = GPR(kernel=self.kernel_, alpha=self.alpha, normalize_y=True, random_state=self.random_state,
+                 n_restarts_optimizer=self.n_restarts_optimizer if self.num_optimizations == 0 else 0)
+        gp.fit(self._X_scaled, self._y)
+        self.kernel_ = gp.kernel_
+        K_y = self.kernel_(self._X_scaled) + self.alpha * np.eye(len(self._X_scaled))
+        self.L_ = np.linalg.cholesky(K_y)
+        self._update_targets()
+        self._reference_likelihood = self.log_marginal_likelihood_ / len(self._y)
+        self._points_since_optimization = 0
+        self.num_optimizations += 1
+        logging.debug('Re-optimized the surrogate: %s', self.kernel_)
+
+    def predict(self, X: np.ndarray, return_std: bool = False):
+        """
+        Posterior mean and optionally standard deviation of the targets
+        :param X: (m, d) array of inputs
+        :param return_std: also return the standard deviation
+        :return: (m, ) mean and, if return_std, (m, ) standard deviation
+        """
+        X = self._scale(np.asarray(X, dtype=float).reshape(-1, self._X.shape[1]))
+        K_star = self.kernel_(self._X_scaled, X)
+        mean = K_star.T @ self.alpha_ * self._y_std + self._y_mean
+        if not return_std:
+            return mean
+        v = solve_triangular(self.L_, K_star, lower=True)
+        var = np.maximum(self.kernel_.diag(X) - np.sum(v ** 2, axis=0), 0.)
+        return mean, np.sqrt(var) * self._y_std
+
+    def _kernel_gradient(self, X: np.ndarray, K_star: np.ndarray) -> np.ndarray:
+        """
+        Derivative of k(X_train, x) with respect to the (scaled) test point x
+        :param X: (m, d) array of scaled inputs
+        :param K_star: (n, m) kernel matrix between the scaled training inputs and X
+        :return: (n, m, d) array
+        """
+        length_scale = np.asarray(self.kernel_.length_scale, dtype=float)
+        diff = (X[None, :, :] - self._X_scaled[:, None, :]) / length_scale ** 2  # (n, m, d)
+        if isinstance(self.kernel_, Matern):  # Matern is a subclass of RBF, test it first
+            if self.kernel_.nu != 2.5:
+                raise NotImplementedError
+            r = np.sqrt(np.sum(((X[None, :, :] - self._X_scaled[:, None, :]) / length_scale) ** 2, axis=-1))
+            return (-5 / 3 * (1 + np.sqrt(5) * r) * np.exp(-np.sqrt(5) * r))[..., None] * diff
+        if isinstance(self.kernel_, RBF):
+            return -K_star[..., None] * diff
+        raise NotImplementedError
+
+    def predict_gradient(self, X: np.ndarray):
+        """
+        Posterior mean and standard deviation with their gradients with respect to the inputs. Supported for RBF and
+        Matern(nu=2.5) kernels
+        :param X: (m, d) array of inputs
+        :return: (m, ) mean, (m, ) standard deviation, (m, d) gradient of the mean and (m, d) gradient of the
+                 standard deviation
+        """
+        X = self._scale(np.asarray(X, dtype=float).reshape(-1, self._X.shape[1]))
+        K_star = self.kernel_(self._X_scaled, X)
+        dK_star = self._kernel_gradient(X, K_star) / self._x_std  # chain rule of the input scaling
+        mean = K_star.T @ self.alpha_ * self._y_std + self._y_mean
+        d_mean = np.einsum('n,nmd->md', self.alpha_, dK_star) * self._y_std
+        K_inv_k = cho_solve((self.L_, True), K_star)
+        var = np.maximum(self.kernel_.diag(X) - np.sum(K_star * K_inv_k, axis=0), 0.)
+        std = np.sqrt(var)
+        # d var / dx = -2 k^T K_y^-1 dk / dx, the prior variance does not depend on x for stationary kernels
+        d_var = -2 * np.einsum('nm,nmd->md', K_inv_k, dK_star)
+        d_std = np.where(std[:, None] > 0, d_var / (2 * np.maximum(std[:, None], 1e-12)), 0.)
+        return mean, std * self._y_std, d_mean, d_std * self._y_std
@@ -0,0 +1,73 @@
+import unittest
+
+import matplotlib
+import numpy as np
+from scipy.optimize import approx_fprime
+from sklearn.gaussian_process.kernels import RBF, Matern
+
+from src.main import f, EI, LCB, optimize_acquisition
+from src.surrogate import IncrementalGP
+
+matplotlib.use('Agg')
+
+
+class TestVectorizedAcquisition(unittest.TestCase):
+
+    def setUp(self):
+        np.random.seed(0)
+        self.x = np.random.uniform(-15, 10, (12, 1))
+        self.y = [f(i) for i in self.x]
+
+    def test_batch_matches_single_points(self):
+        """
+        Test a batch of candidates gives the same values as one candidate at a time, including observed points
+        """
+        gp = IncrementalGP(random_state=0).fit(self.x, self.y)
+        candidates = np.vstack([np.linspace(-15, 10, 20).reshape(-1, 1), self.x[:3]])
+        for acquisition in [EI, LCB]:
+            values = acquisition(candidates, gp, min(self.y), 1)
+            self.assertEqual((23,), values.shape)
+            self.assertTrue(np.all(np.isfinite(values)))
+            self.assertTrue(np.allclose([acquisition(c[0], gp, min(self.y), 1)[0] for c in candidates], values))
+
+    def test_gradients(self):
+        """
+        Test the analytic gradients against finite differences, for one and two dimensional inputs
+        """
+        x_2d = np.random.uniform(-15, 10, (12, 2))
+        y_2d = [f(i) for i in x_2d]
+        for kernel, x, y in [(Matern(nu=2.5), self.x, self.y), (RBF(), self.x, self.y),
+                             (Matern(nu=2.5, length_scale=[1., 1.]), x_2d, y_2d)]:
+            gp = IncrementalGP(kernel=kernel, random_state=0).fit(x, y)
+            candidates = np.random.uniform(-14, 9, (5, x.shape[1]))
+            for acquisition in [EI, LCB]:
+                values, gradients = acquisition(candidates, gp, min(y), 1, return_gradient=True)
+                self.assertTrue(np.allclose(acquisition(candidates, gp, min(y), 1), values))
+                for candidate, gradient in zip(candidates, gradients):
+                    expected = approx_fprime(candidate, lambda c: acquisition(c, gp, min(y), 1)[0], 1e-6)
+                    self.assertTrue(np.allclose(expected, gradient, rtol=1e-3, atol=1e-7))
+
+    def test_optimizer(self):
+        """
+        Test the multi-start optimizer finds the minimum of a dense grid, with and without threads and gradients
+        """
+        gp = IncrementalGP(random_state=0).fit(self.x, self.y)
+        grid = np.linspace(-15, 10, 20001).reshape(-1, 1)
+        for acquisition in [EI, LCB]:
+            grid_min = np.min(acquisition(grid, gp, min(self.y), 1))
+            results = [optimize_acquisition(acquisition, gp, min(self.y), 1, num_candidates=64, top_k=4,
+                                            max_workers=max_workers, seed=0) for max_workers in [1, 4]]
+            for x, value, stats in results:
+                self.assertTrue(-15 <= x[0] <= 10)
+                self.assertTrue(np.isclose(value, acquisition(x, gp, min(self.y), 1)[0]))
+                self.assertLessEqual(value, grid_min + 1e-6)
+                self.assertEqual(4, stats['num_starts'])
+                self.assertGreater(stats['num_evaluations'], 64)
+            self.assertTrue(np.allclose(results[0][0], results[1][0]))
+            _, value, _ = optimize_acquisition(acquisition, gp, min(self.y), 1, num_candidates=64, top_k=4,
+                                               sobol=False, seed=0)
+            self.assertLessEqual(value, grid_min + 1e-6)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+import matplotlib
+import numpy as np
+
+from src.main import f, EI, run_async_bo
+
+matplotlib.use('Agg')
+
+
+class SlowFunction:
+    """f with runtimes that vary by 10x after the initial design, records how many evaluations run at the same
+    time"""
+
+    def __init__(self, init):
+        self.init = init
+        self.running = 0
+        self.max_running = 0
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def __call__(self, x):
+        with self.lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+            self.calls.append(np.ravel(x)[0])
+            index = len(self.calls)
+        if index > self.init:
+            time.sleep(0.05 if index % 3 else 0.5)
+        with self.lock:
+            self.running -= 1
+        return f(x)
+
+
+class TestAsyncBO(unittest.TestCase):
+
+    def test_async_bo(self):
+        """
+        Test async BO evaluates max_iter distinct points with all workers busy
+        """
+        func = SlowFunction(25)
+        y = run_async_bo(EI, 45, num_workers=3, init=25, seed=0, func=func)
+        self.assertEqual(45, len(y))
+        self.assertEqual(45, len(func.calls))
+        self.assertEqual(3, func.max_running)
+        self.assertLessEqual(min(y), min(y[:25]))
+        # pending points are fantasized, so no point is proposed twice
+        self.assertTrue(np.all(np.diff(np.sort(func.calls[25:])) > 1e-6))
+
+    def test_given_executor(self):
+        """
+        Test async BO with an external pool
+        """
+        func = SlowFunction(20)
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            y = run_async_bo(EI, 30, num_workers=2, init=20, seed=1, func=func, executor=executor)
+        self.assertEqual(30, len(y))
+        self.assertEqual(2, func.max_running)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+import matplotlib
+import numpy as np
+
+from src.main import f, EI, LCB, BatchStrategy, run_batch_bo
+
+matplotlib.use('Agg')
+
+
+class RecordingFunction:
+    """f that records the points it is called with"""
+
+    def __init__(self):
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def __call__(self, x):
+        with self.lock:
+            self.calls.append(np.ravel(x)[0])
+        return f(x)
+
+
+class TestBatchBO(unittest.TestCase):
+
+    def test_batch_bo(self):
+        """
+        Test batch BO evaluates max_iter distinct points and does not depend on the executor
+        """
+        for acquisition, strategy in [(EI, BatchStrategy.KRIGING_BELIEVER), (LCB, BatchStrategy.CONSTANT_LIAR)]:
+            func = RecordingFunction()
+            with ThreadPoolExecutor(max_workers=3) as executor:
+                y = run_batch_bo(acquisition, 37, q=4, init=25, seed=0, strategy=strategy, func=func,
+                                 executor=executor)
+            self.assertEqual(37, len(y))
+            self.assertEqual(37, len(func.calls))
+            self.assertLessEqual(min(y), min(y[:25]))
+            # the fantasized pending points keep the proposals of a batch apart
+            for start in range(25, 37, 4):
+                batch = np.sort(func.calls[start:start + 4])
+                self.assertTrue(np.all(np.diff(batch) > 1e-3))
+            self.assertTrue(np.allclose(y, run_batch_bo(acquisition, 37, q=4, init=25, seed=0, strategy=strategy,
+                                                        max_workers=1)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import unittest
+
+import matplotlib
+import numpy as np
+from sklearn.gaussian_process import GaussianProcessRegressor as GPR
+
+from src.main import f, EI, run_bo
+from src.surrogate import IncrementalGP
+
+matplotlib.use('Agg')
+
+
+class TestIncrementalGP(unittest.TestCase):
+
+    def setUp(self):
+        np.random.seed(0)
+        self.x = np.random.uniform(-15, 10, 15).reshape(-1, 1)
+        self.y = np.array([f(i) for i in self.x])
+
+    def test_updates_match_refit(self):
+        """
+        Test adding points gives the same posterior as factorizing K_y from scratch with the same hyperparameters.
+        """
+        gp = IncrementalGP(refit_interval=None, drift_tolerance=None, random_state=0).fit(self.x[:10], self.y[:10])
+        gp.add(self.x[10], self.y[10])
+        gp.add(self.x[11:], self.y[11:])
+        self.assertEqual(1, gp.num_optimizations)
+
+        x_axis = np.linspace(-15, 10, 50).reshape(-1, 1)
+        reference = GPR(kernel=gp.kernel_, alpha=gp.alpha, optimizer=None, normalize_y=True)
+        reference.fit(gp._scale(self.x), self.y)
+        m, s = gp.predict(x_axis, return_std=True)
+        m_ref, s_ref = reference.predict(gp._scale(x_axis), return_std=True)
+        self.assertTrue(np.allclose(m_ref, m))
+        self.assertTrue(np.allclose(s_ref, s, atol=1e-6))
+
+    def test_schedule(self):
+        """
+        Test the hyperparameters are re-optimized every refit_interval points.
+        """
+        gp = IncrementalGP(refit_interval=2, drift_tolerance=None, random_state=0).fit(self.x[:10], self.y[:10])
+        for i in range(10, 15):
+            gp.add(self.x[i], self.y[i])
+        self.assertEqual(3, gp.num_optimizations)
+
+    def test_run_bo(self):
+        """
+        Test BO with the incremental surrogate evaluates max_iter points and improves on the initial design.
+        """
+        y = run_bo(EI, 35, init=25, seed=0)
+        self.assertEqual(35, len(y))
+        self.assertLessEqual(min(y), min(y[:25]))
+
+
+if __name__ == '__main__':
+    unittest.main()